@@ -0,0 +1,172 @@
+import json
+import argparse
+import itertools
+import timeit
+from collections import Counter
+import numpy as np
+
+from skeleton import BODY_PART_NAMES
+from datastore import open_datastore
+from score import load_selected, object_extents, keypoint_similarity
+
+
+def align_many(annotation_sets):
+    ''' Returns file names annotated in at least two of the given (file names, coordinates) sets, coordinates of
+        shape (M, K, NUM_BODY_PARTS, 2) with NaN where an image is missing from a set, and a mask of shape (M, K) '''
+
+    # Hash join on file name, keeping only images that can be compared
+    counts = Counter(filename for filenames, _ in annotation_sets for filename in set(filenames))
+    shared = [filename for filename, count in counts.items() if count >= 2]
+    positions = {filename: i for i, filename in enumerate(shared)}
+
+    coordinates = np.full((len(shared), len(annotation_sets), len(BODY_PART_NAMES), 2), np.nan)
+    for k, (filenames, set_coordinates) in enumerate(annotation_sets):
+        pairs = [(i, positions[filename]) for i, filename in enumerate(filenames) if filename in positions]
+        if pairs:
+            indices, shared_indices = np.array(pairs, dtype=np.int64).T
+            coordinates[shared_indices, k] = set_coordinates[indices]
+
+    return shared, coordinates, ~np.isnan(coordinates[..., 0, 0])
+
+
+def pairwise_distances(coordinates, mask):
+    ''' Returns annotator pairs, distances of shape (M, P, NUM_BODY_PARTS) between the keypoints of each pair and a
+        mask of shape (M, P) of pairs where both annotated the image '''
+
+    pairs = list(itertools.combinations(range(coordinates.shape[1]), 2))
+    first, second = np.array(pairs, dtype=np.int64).T
+    distances = np.linalg.norm(coordinates[:, first] - coordinates[:, second], axis=-1)
+
+    return pairs, distances, mask[:, first] & mask[:, second]
+
+
+def krippendorff_alpha(coordinates, mask):
+    ''' Returns Krippendorff's alpha of shape (NUM_BODY_PARTS,) with squared Euclidean distance between keypoints as
+        difference function, over images annotated by at least two annotators '''
+
+    counts = mask.sum(axis=1)
+    num_values = counts.sum()
+    values = np.where(mask[..., None, None], coordinates, 0)
+
+    # Sums of squared differences over ordered pairs follow from squared deviations from the means
+    unit_means = values.sum(axis=1) / counts[:, None, None]
+    unit_deviations = np.where(mask[..., None, None], values - unit_means[:, None], 0)
+    unit_squares = (unit_deviations ** 2).sum(axis=(1, 3))
+    observed = (2 * counts / (counts - 1))[:, None] * unit_squares
+    observed = observed.sum(axis=0) / num_values
+
+    total_mean = values.sum(axis=(0, 1)) / num_values
+    total_deviations = np.where(mask[..., None, None], values - total_mean, 0)
+    expected = 2 * (total_deviations ** 2).sum(axis=(0, 1, 3)) / (num_values - 1)
+
+    return 1 - observed / np.maximum(expected, np.finfo(float).tiny)
+
+
+def agreement(coordinates, mask):
+    ''' Returns per-joint, per-image and per-pair agreement between annotators of aligned coordinates '''
+
+    pairs, distances, pair_mask = pairwise_distances(coordinates, mask)
+    extents = object_extents(np.nanmean(coordinates, axis=1))
+    num_images, num_pairs = pair_mask.shape
+    similarity = keypoint_similarity(distances.reshape(num_images * num_pairs, -1),
+                                     np.repeat(extents.prod(axis=1), num_pairs)).reshape(distances.shape)
+
+    # Masked means over annotator pairs
+    weights = pair_mask[..., None].astype(float)
+    distances = np.where(pair_mask[..., None], distances, 0)
+    similarity = np.where(pair_mask[..., None], similarity, 0)
+    pairs_per_image = weights.sum(axis=1)
+
+    return {'pairs': pairs,
+            'pair_images': pair_mask.sum(axis=0),
+            'pair_oks': similarity.mean(axis=2).sum(axis=0) / np.maximum(pair_mask.sum(axis=0), 1),
+            'image_distance': distances.sum(axis=1) / pairs_per_image,
+            'image_max_distance': distances.max(axis=1),
+            'image_oks': similarity.mean(axis=2).sum(axis=1) / pairs_per_image[:, 0],
+            'joint_distance': distances.sum(axis=(0, 1)) / weights.sum(),
+            'joint_similarity': similarity.sum(axis=(0, 1)) / weights.sum(),
+            'joint_alpha': krippendorff_alpha(coordinates, mask)}
+
+
+def summarize(results, filenames, annotation_paths, num_disputed):
+    ''' Returns a json-serializable summary of agreement, with the most disputed images and joints first '''
+
+    joints = {body_part: {'mean_distance': float(results['joint_distance'][j]),
+                          'mean_similarity': float(results['joint_similarity'][j]),
+                          'alpha': float(results['joint_alpha'][j])}
+              for j, body_part in enumerate(BODY_PART_NAMES)}
+    pairs = [{'annotations': [annotation_paths[a], annotation_paths[b]], 'images': int(results['pair_images'][p]),
+              'mean_oks': float(results['pair_oks'][p])} for p, (a, b) in enumerate(results['pairs'])]
+
+    disputed_images = np.argsort(results['image_oks'], kind='stable')[:num_disputed]
+    max_distances = results['image_max_distance']
+    disputed_joints = np.argsort(-max_distances, axis=None, kind='stable')[:num_disputed]
+    disputed_joints = np.column_stack(np.unravel_index(disputed_joints, max_distances.shape))
+
+    return {'images': len(filenames),
+            'joints': joints,
+            'pairs': pairs,
+            'disputed_images': [{'file': filenames[i], 'oks': float(results['image_oks'][i]),
+                                 'mean_distance': float(results['image_distance'][i].mean())}
+                                for i in disputed_images],
+            'disputed_joints': [{'file': filenames[i], 'body_part': BODY_PART_NAMES[j],
+                                 'max_distance': float(max_distances[i, j])} for i, j in disputed_joints]}
+
+
+def print_report(summary, seconds):
+    ''' Print a summary as tables of body parts, annotator pairs and disputed images and joints '''
+
+    print("{} images annotated more than once, compared in {:.1f} ms".format(summary['images'], seconds * 1e3))
+    if not summary['images']:
+        return
+
+    print("{:<16}{:>10}{:>10}{:>10}".format('Body part', 'Distance', 'OKS', 'Alpha'))
+    for body_part, joint in summary['joints'].items():
+        print("{:<16}{:>10.4f}{:>10.3f}{:>10.3f}".format(
+            body_part, joint['mean_distance'], joint['mean_similarity'], joint['alpha']))
+
+    print("\nAnnotator pairs")
+    for pair in summary['pairs']:
+        print("{} / {}: {} images, OKS {:.3f}".format(*pair['annotations'], pair['images'], pair['mean_oks']))
+
+    print("\nMost disputed images")
+    for image in summary['disputed_images']:
+        print("{}: OKS {:.3f}, mean distance {:.4f}".format(image['file'], image['oks'], image['mean_distance']))
+
+    print("\nMost disputed joints")
+    for joint in summary['disputed_joints']:
+        print("{} {}: distance {:.4f}".format(joint['file'], joint['body_part'], joint['max_distance']))
+
+
+def main(args):
+    ''' Measure agreement between annotators of images annotated more than once '''
+
+    if len(args.annotations) < 2:
+        raise SystemExit('At least two annotation files are required')
+
+    statuses = set(args.statuses.split(','))
+    annotation_sets = [load_selected(open_datastore(file_name, training=True, read_only=True), statuses)
+                       for file_name in args.annotations]
+
+    start = timeit.default_timer()
+    filenames, coordinates, mask = align_many(annotation_sets)
+    results = agreement(coordinates, mask) if filenames else None
+    seconds = timeit.default_timer() - start
+
+    summary = summarize(results, filenames, args.annotations, args.disputed) if filenames else {'images': 0}
+    print_report(summary, seconds)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--annotations', type=str, nargs='+', required=True, help='Paths of annotations of different annotators')
+    parser.add_argument('--statuses', type=str, default='True', help='Comma-separated statuses of images to compare')
+    parser.add_argument('--disputed', type=int, default=10, help='Number of most disputed images and joints to list')
+    parser.add_argument('--json', type=str, help='Path of json file to write the report to')
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,64 @@
+import os
+import sys
+import argparse
+import tempfile
+import timeit
+import resource
+import multiprocessing
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from images import RESAMPLE_PRESETS, decode_image, get_resized_size
+from synthetic import write_images
+
+
+def full_decode(path, max_size, resample):
+    ''' Decode at full resolution and resize, the way images were loaded before draft mode '''
+
+    with Image.open(path) as img:
+        return img.resize(get_resized_size(img.size, max_size), resample=RESAMPLE_PRESETS[resample])
+
+
+def measure(decode, paths, max_size, resample, repeat, queue):
+    ''' Time decoding all images and record the growth of peak memory of this process '''
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    seconds = min(timeit.repeat(lambda: [decode(path, max_size, resample) for path in paths], number=1, repeat=repeat))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((seconds / len(paths), (peak - baseline) / 1024))
+
+
+def main(args):
+    ''' Compare decode and resize time and peak memory of full-resolution and reduced-resolution decoding '''
+
+    max_size = (args.screen_width, args.screen_height)
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        # Write images in a separate process, since peak memory of this process is inherited by measuring processes
+        with context.Pool(1) as pool:
+            paths = pool.apply(write_images, (directory, args.images, (args.width, args.height)))
+        print("{} JPEG images of {}x{} resized to fit {}x{}".format(args.images, args.width, args.height, *max_size))
+
+        # Measure each path in a fresh process to obtain its own peak memory
+        for resample in sorted(RESAMPLE_PRESETS):
+            for name, decode in [('full', full_decode), ('draft', decode_image)]:
+                queue = context.Queue()
+                process = context.Process(target=measure, args=(decode, paths, max_size, resample, args.repeat, queue))
+                process.start()
+                seconds, peak_mb = queue.get()
+                process.join()
+                print("{:>8} {:>5}: {:7.1f} ms per image, peak memory +{:.0f} MB".format(
+                    resample, name, seconds * 1e3, peak_mb))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=5, help='Number of synthetic images')
+    parser.add_argument('--width', type=int, default=4000, help='Width of synthetic images')
+    parser.add_argument('--height', type=int, default=3000, help='Height of synthetic images')
+    parser.add_argument('--screen-width', type=int, default=1920, dest='screen_width', help='Width of the image area')
+    parser.add_argument('--screen-height', type=int, default=918, dest='screen_height', help='Height of the image area')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of repetitions, the fastest is reported')
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,71 @@
+import os
+import sys
+import argparse
+import timeit
+import tkinter as tk
+from PIL import ImageTk, Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from skeleton import BASE_DIR, NUM_BODY_PARTS
+from images import load_guideline_images
+
+
+def load_guideline_image(body_part_index, height):
+    ''' Open and resize a single guideline image, the way it was done on every click before the atlas '''
+
+    guideline_image_path = os.path.join(
+        BASE_DIR, 'frontend/body_parts', '{}.png'.format(body_part_index))
+    img = Image.open(guideline_image_path)
+    width, image_height = img.size
+    resized_width = int((float(width) / float(image_height)) * float(height))
+    return img.resize((resized_width, height))
+
+
+def main(args):
+    ''' Compare the cost of changing guideline image per click with and without the precomputed atlas '''
+
+    # Creating PhotoImage objects requires a display
+    try:
+        root = tk.Tk()
+        root.withdraw()
+        label = tk.Label(root)
+    except tk.TclError:
+        root = None
+        print("No display available, PhotoImage creation and label updates are not included")
+
+    def per_click(body_part_index):
+        img = load_guideline_image(body_part_index, args.height)
+        if root is not None:
+            photo = ImageTk.PhotoImage(img)
+            label.configure(image=photo)
+            label.image = photo
+
+    atlas = load_guideline_images(args.height)
+    if root is not None:
+        atlas = [ImageTk.PhotoImage(img) for img in atlas]
+
+    def atlas_swap(body_part_index):
+        image = atlas[body_part_index]
+        if root is not None:
+            label.configure(image=image)
+            label.image = image
+
+    setup_seconds = min(timeit.repeat(lambda: load_guideline_images(args.height), number=1, repeat=args.repeat))
+    print("Atlas setup at startup: {:.2f} ms".format(setup_seconds * 1e3))
+
+    for name, change_guideline in [('per click', per_click), ('atlas', atlas_swap)]:
+        seconds = min(timeit.repeat(lambda: [change_guideline(i) for i in range(NUM_BODY_PARTS + 1)],
+                                    number=1, repeat=args.repeat))
+        print("{:>10}: {:.1f} us per guideline change".format(name, seconds * 1e6 / (NUM_BODY_PARTS + 1)))
+
+    if root is not None:
+        root.destroy()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--height', type=int, default=150, help='Height of guideline images in pixels')
+    parser.add_argument('--repeat', type=int, default=10, help='Number of repetitions, the fastest is reported')
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,66 @@
+import os
+import sys
+import argparse
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from keyframes import INTERPOLATION_METHODS, interpolate_keypoints
+from skeleton import NUM_BODY_PARTS
+
+
+def smooth_motion(num_frames, seed=42):
+    ''' Returns normalized coordinates of shape (num_frames, NUM_BODY_PARTS, 2) of body parts moving along random sums
+        of slow sinusoids '''
+
+    rng = np.random.default_rng(seed)
+    frames = np.arange(num_frames, dtype=np.float64)[:, None, None]
+    amplitudes = rng.uniform(0.0, 0.1, (3, NUM_BODY_PARTS, 2))
+    periods = rng.uniform(40, 200, (3, NUM_BODY_PARTS, 2))
+    phases = rng.uniform(0, 2 * np.pi, (3, NUM_BODY_PARTS, 2))
+    motion = sum(amplitudes[i] * np.sin(2 * np.pi * frames / periods[i] + phases[i]) for i in range(3))
+    return np.clip(rng.uniform(0.3, 0.7, (NUM_BODY_PARTS, 2)) + motion, 0.0, 1.0)
+
+
+def interpolate_per_frame(numbers, coordinates, query_numbers):
+    ''' Linear interpolation one frame and body part at a time, as a reference for the vectorised pass '''
+
+    result = []
+    for number in query_numbers:
+        k = max(i for i in range(len(numbers) - 1) if numbers[i] <= number)
+        t = (number - numbers[k]) / (numbers[k + 1] - numbers[k])
+        result.append([[(1 - t) * start + t * end for start, end in zip(coordinates[k][j], coordinates[k + 1][j])]
+                       for j in range(NUM_BODY_PARTS)])
+    return np.array(result)
+
+
+def main(args):
+    ''' Time interpolation of a video between keyframes and measure the error of every method against the true motion '''
+
+    truth = smooth_motion(args.frames)
+    numbers = np.arange(0, args.frames, args.interval)
+    query_numbers = np.setdiff1d(np.arange(args.frames), numbers)
+    query_numbers = query_numbers[query_numbers < numbers[-1]]
+    coordinates = truth[numbers]
+
+    print("{} frames, keyframe interval {}, {} frames interpolated".format(args.frames, args.interval, len(query_numbers)))
+    start = timeit.default_timer()
+    interpolate_per_frame(numbers, coordinates.tolist(), query_numbers.tolist())
+    print("{:<12}{:>10.2f} ms".format('per frame', (timeit.default_timer() - start) * 1e3))
+
+    for method in INTERPOLATION_METHODS:
+        start = timeit.default_timer()
+        interpolated = interpolate_keypoints(numbers, coordinates, query_numbers, method)
+        elapsed = timeit.default_timer() - start
+        error = np.linalg.norm(interpolated - truth[query_numbers], axis=2)
+        print("{:<12}{:>10.2f} ms   mean error {:.5f}, max error {:.5f}".format(method, elapsed * 1e3, error.mean(),
+                                                                              error.max()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=10000, help='Number of frames of the synthetic video')
+    parser.add_argument('--interval', type=int, default=8, help='Number of frames between keyframes')
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,142 @@
+import os
+import sys
+import argparse
+import timeit
+import random
+import tkinter as tk
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gui import Annotate
+from metrics import Metrics
+from skeleton import BODY_PART_NAMES, BODY_PART_PARENT, BODY_PART_CHILDREN, NUM_BODY_PARTS
+
+
+class NullCanvas:
+    ''' Stands in for the canvas without a display, such that only the cost of the handler itself is measured '''
+
+    def move(self, item, delta_x, delta_y):
+        pass
+
+    def coords(self, item, *coordinates):
+        pass
+
+
+class IdleQueue:
+    ''' Stands in for the idle callbacks of Tk, run explicitly once per simulated frame '''
+
+    def __init__(self):
+        self.callbacks = {}
+        self.next_id = 0
+
+    def after_idle(self, callback):
+        self.next_id += 1
+        self.callbacks[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, callback_id):
+        self.callbacks.pop(callback_id, None)
+
+    def run(self):
+        callbacks, self.callbacks = self.callbacks, {}
+        for callback in callbacks.values():
+            callback()
+
+
+def legacy_motion(self, event):
+    ''' Handle a motion event the way on_marker_motion did before the compiled topology tables, drawing every event '''
+
+    self.is_dragging = True
+    delta_x = event.x - self._drag_data["x"]
+    delta_y = event.y - self._drag_data["y"]
+    self.top_canvas.move(self._drag_data["item"], delta_x, delta_y)
+    current_body_part_index = self._drag_data["item"] - 2 - NUM_BODY_PARTS
+    parent_index = BODY_PART_NAMES.index(BODY_PART_PARENT[current_body_part_index])
+    if current_body_part_index == parent_index:
+        self.top_canvas.coords(self.lines[current_body_part_index], event.x, event.y, event.x, event.y)
+    else:
+        normalized_x_parent, normalized_y_parent = self.current_coordinates[parent_index]
+        self.top_canvas.coords(self.lines[current_body_part_index], event.x, event.y,
+                               normalized_x_parent * self.image.width, normalized_y_parent * self.image.height)
+    for child in BODY_PART_CHILDREN[current_body_part_index]:
+        child_index = BODY_PART_NAMES.index(child)
+        normalized_x_child, normalized_y_child = self.current_coordinates[child_index]
+        self.top_canvas.coords(self.lines[child_index], event.x, event.y,
+                               normalized_x_child * self.image.width, normalized_y_child * self.image.height)
+    self._drag_data["x"] = event.x
+    self._drag_data["y"] = event.y
+
+
+def create_state(canvas):
+    ''' Returns the attributes of Annotate used by motion events, with items created in the same order as the GUI '''
+
+    random.seed(42)
+    if canvas is None:
+        canvas = NullCanvas()
+        canvas_image = 1
+        lines = list(range(2, 2 + NUM_BODY_PARTS))
+        markers = list(range(2 + NUM_BODY_PARTS, 2 + 2 * NUM_BODY_PARTS))
+    else:
+        canvas_image = canvas.create_rectangle(0, 0, 0, 0)
+        lines = [canvas.create_line(0, 0, 0, 0) for _ in range(NUM_BODY_PARTS)]
+        markers = [canvas.create_oval(0, 0, 0, 0) for _ in range(NUM_BODY_PARTS)]
+    assert canvas_image == 1
+
+    state = SimpleNamespace(top_canvas=canvas, root=IdleQueue(), lines=lines, markers=markers,
+                           marker_body_parts={marker: i for i, marker in enumerate(markers)},
+                           current_coordinates=[(random.random(), random.random()) for _ in range(NUM_BODY_PARTS)],
+                           image=SimpleNamespace(width=1600, height=900), is_dragging=False,
+                           _drag_data={"x": 0, "y": 0, "item": None}, drag_pointer=None, drag_render=None,
+                           drag_pending_since=0.0, metrics=None)
+    for method in ['render_drag', 'flush_drag']:
+        setattr(state, method, getattr(Annotate, method).__get__(state))
+
+    return state
+
+
+def main(args):
+    ''' Compare the cost of marker motion events with and without compiled topology tables and coalescing, with a
+        number of events arriving between frames '''
+
+    # Canvas updates require a display
+    try:
+        root = tk.Tk()
+        root.withdraw()
+        canvas = tk.Canvas(root)
+    except tk.TclError:
+        root = canvas = None
+        print("No display available, canvas updates are not included")
+
+    state = create_state(canvas)
+    events = [SimpleNamespace(x=random.randint(0, 1600), y=random.randint(0, 900)) for _ in range(args.events)]
+
+    def drag(handle_motion):
+        for marker in state.markers:
+            state._drag_data.update(x=0, y=0, item=marker)
+            for i, event in enumerate(events):
+                handle_motion(state, event)
+                if (i + 1) % args.events_per_frame == 0:
+                    state.root.run()
+            state.flush_drag()
+
+    print("{} motion events per frame".format(args.events_per_frame))
+    for name, handle_motion in [('legacy', legacy_motion), ('coalesced', Annotate.on_marker_motion)]:
+        state.metrics = Metrics(None)
+        seconds = min(timeit.repeat(lambda: drag(handle_motion), number=1, repeat=args.repeat))
+        print("{:>10}: {:.2f} us per motion event".format(name, seconds * 1e6 / (args.events * NUM_BODY_PARTS)))
+    latencies = state.metrics.histograms['drag_event_to_paint']
+    print("Canvas updates per drag with coalescing: {}, median event-to-update latency {:.1f} us".format(
+        latencies.count // (args.repeat * NUM_BODY_PARTS), latencies.percentile(50) * 1e6))
+
+    if root is not None:
+        root.destroy()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=2000, help='Number of motion events per body part')
+    parser.add_argument('--events-per-frame', type=int, default=4, dest='events_per_frame', help='Number of motion events arriving between two idle ticks')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of repetitions, the fastest is reported')
+    args = parser.parse_args()
+
+    main(args)
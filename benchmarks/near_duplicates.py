@@ -0,0 +1,62 @@
+import os
+import sys
+import argparse
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from duplicates import DUPLICATE_DISTANCE, find_duplicates, hamming_distance
+
+
+def random_hashes(num_hashes, duplicate_fraction, max_distance, seed=42):
+    ''' Returns random 64-bit hashes of which a fraction are copies of earlier hashes with up to max_distance bits
+        flipped '''
+
+    rng = np.random.default_rng(seed)
+    hashes = rng.integers(0, 2 ** 63, num_hashes, dtype=np.uint64) * np.uint64(2)
+    copies = np.flatnonzero(rng.random(num_hashes) < duplicate_fraction)
+    copies = copies[copies > 0]
+    sources = (rng.random(len(copies)) * copies).astype(np.int64)
+    flips = np.zeros(len(copies), dtype=np.uint64)
+    for _ in range(max_distance):
+        flips |= np.uint64(1) << rng.integers(0, 64, len(copies)).astype(np.uint64)
+    hashes[copies] = hashes[sources] ^ flips
+    return hashes
+
+
+def compare_all_pairs(hashes, max_distance):
+    ''' Returns the number of pairs of hashes within the distance, comparing every hash with all hashes after it '''
+
+    return sum(int((hamming_distance(hashes[i + 1:], hashes[i]) <= max_distance).sum()) for i in range(len(hashes) - 1))
+
+
+def main(args):
+    ''' Time grouping near-duplicates of increasing numbers of hashes with the multi-index, and comparing all pairs for
+        the smaller numbers '''
+
+    print("{:>10}{:>16}{:>16}{:>14}".format('Hashes', 'Multi-index s', 'All pairs s', 'Duplicates'))
+    for num_hashes in args.sizes:
+        hashes = random_hashes(num_hashes, args.duplicates, args.distance)
+        start = timeit.default_timer()
+        originals = find_duplicates(hashes, args.distance)
+        elapsed = timeit.default_timer() - start
+
+        all_pairs = ''
+        if num_hashes <= args.max_all_pairs:
+            start = timeit.default_timer()
+            compare_all_pairs(hashes, args.distance)
+            all_pairs = '{:.3f}'.format(timeit.default_timer() - start)
+
+        num_duplicates = int((originals != np.arange(num_hashes)).sum())
+        print("{:>10}{:>16.3f}{:>16}{:>14}".format(num_hashes, elapsed, all_pairs, num_duplicates))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='Numbers of hashes to group')
+    parser.add_argument('--duplicates', type=float, default=0.2, help='Fraction of hashes that are near-duplicates')
+    parser.add_argument('--distance', type=int, default=DUPLICATE_DISTANCE, help='Largest number of differing bits of near-duplicates')
+    parser.add_argument('--max-all-pairs', type=int, default=20000, dest='max_all_pairs', help='Largest number of hashes to compare all pairs of')
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,65 @@
+import os
+import sys
+import csv
+import argparse
+import tempfile
+import timeit
+from ast import literal_eval as make_tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datastore import Datastore
+from skeleton import BODY_PART_NAMES
+from synthetic import write_annotations
+
+
+def legacy_resume(file_name):
+    ''' Resume the way annotate.py did before the single-pass loader: three full reads and literal_eval '''
+
+    def read_file():
+        with open(file_name, 'r') as f:
+            return [row for row in csv.DictReader(f)]
+
+    last_index = -1
+    for row in read_file():
+        if row['done'] == 'True':
+            last_index = int(row['index'])
+
+    annotations = []
+    for row in read_file():
+        coordinates = [row[body_part.lower().replace(' ', '_')] for body_part in BODY_PART_NAMES]
+        annotations.append([make_tuple(coordinate) for coordinate in coordinates])
+
+    statuses = [row['done'] for row in read_file()]
+
+    return annotations, statuses, last_index
+
+
+def single_pass_resume(file_name):
+    ''' Resume through Datastore.load '''
+
+    return Datastore(file_name, training=True).load()
+
+
+def main(args):
+    ''' Compare time to resume annotation work from a large csv file '''
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, 'annotations.csv')
+        write_annotations(file_name, args.rows)
+        print("Resuming from {} rows ({:.1f} MB)".format(args.rows, os.path.getsize(file_name) / 1e6))
+
+        for name, resume in [('single pass', single_pass_resume), ('legacy', legacy_resume)]:
+            if name == 'legacy' and args.skip_legacy:
+                continue
+            seconds = min(timeit.repeat(lambda: resume(file_name), number=1, repeat=args.repeat))
+            print("{:>12}: {:.2f} s".format(name, seconds))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of annotated images in the csv file')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of repetitions, the fastest is reported')
+    parser.add_argument('--skip-legacy', action='store_true', dest='skip_legacy', help='Only time the single-pass loader')
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules imported by every command line path, and by starting the GUI
+STARTUP_PATHS = {'annotate (cli)': ['annotate'], 'annotate (gui)': ['annotate', 'gui'], 'datastore': ['datastore'],
+                 'export': ['export'], 'score': ['score'], 'agreement': ['agreement'], 'eventlog': ['eventlog']}
+GUI_MODULES = ('tkinter', 'PIL.ImageTk')
+
+
+def import_times(modules):
+    ''' Returns self and cumulative import time in microseconds and depth of every module imported, in a fresh
+        interpreter with -X importtime '''
+
+    command = 'import ' + ', '.join(modules) if modules else 'pass'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', command], cwd=REPOSITORY_DIR,
+                            capture_output=True, text=True, check=True)
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        times[name.strip()] = (int(self_us), int(cumulative_us), depth)
+
+    return times
+
+
+def measure(modules, repeat):
+    ''' Returns the fastest import time in microseconds of modules beyond interpreter startup, the modules they import
+        and the direct dependencies taking longest '''
+
+    best = None
+    for _ in range(repeat):
+        baseline = import_times([])
+        times = {name: value for name, value in import_times(modules).items() if name not in baseline}
+        total = sum(self_us for self_us, _, _ in times.values())
+        if best is None or total < best[0]:
+            best = (total, times)
+
+    total, times = best
+    dependencies = sorted([(cumulative_us, name) for name, (_, cumulative_us, depth) in times.items() if depth == 1],
+                          reverse=True)
+    return total, times, dependencies
+
+
+def main(args):
+    ''' Measure import time of the command line and GUI entry points and whether they load Tk '''
+
+    results = {}
+    for path, modules in STARTUP_PATHS.items():
+        total, times, dependencies = measure(modules, args.repeat)
+        results[path] = {'milliseconds': total / 1e3, 'modules': len(times),
+                         'gui_loaded': any(module in times for module in GUI_MODULES),
+                         'slowest': {name: cumulative_us / 1e3 for cumulative_us, name in dependencies[:args.top]}}
+
+    print("{:<18}{:>12}{:>10}{:>8}  {}".format('Path', 'Import ms', 'Modules', 'Tk', 'Slowest dependencies (ms)'))
+    for path, result in results.items():
+        slowest = ', '.join('{} {:.1f}'.format(name, milliseconds) for name, milliseconds in result['slowest'].items())
+        print("{:<18}{:>12.1f}{:>10}{:>8}  {}".format(path, result['milliseconds'], result['modules'],
+                                                     'yes' if result['gui_loaded'] else 'no', slowest))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5, help='Number of fresh interpreters per path, the fastest is reported')
+    parser.add_argument('--top', type=int, default=4, help='Number of slowest direct dependencies to list')
+    parser.add_argument('--json', type=str, help='Path of json file to write results to')
+    args = parser.parse_args()
+
+    main(args)
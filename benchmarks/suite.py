@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+import timeit
+from datetime import datetime
+import numpy as np
+import PIL
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from discovery import IMAGE_EXTENSIONS, get_image_names
+from images import ImageCache, decode_image, get_resized_size
+from datastore import Datastore, open_datastore, convert_datastore
+from score import TRAINING_MARGIN, within_margin
+from synthetic import IMAGE_FORMATS, random_poses, write_annotations, write_images
+
+
+BACKENDS = {'csv': 'annotations.csv', 'binary': 'annotations.kpt', 'sqlite': 'annotations.sqlite'}
+REGRESSION_THRESHOLD = 1.1
+
+
+def best_of(function, repeat, setup=None):
+    ''' Returns the fastest of repeated calls to function in seconds, with setup called untimed before each call '''
+
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = timeit.default_timer()
+        function()
+        times.append(timeit.default_timer() - start)
+
+    return min(times)
+
+
+def get_environment():
+    ''' Returns versions of the code and its dependencies, such that results of different versions can be told apart '''
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+
+    return {'commit': commit, 'date': datetime.now().isoformat(), 'python': platform.python_version(),
+            'platform': platform.platform(), 'numpy': np.__version__, 'pillow': PIL.__version__,
+            'cpus': os.cpu_count()}
+
+
+def copy_store(source, target):
+    ''' Replace a datastore file or folder by a copy of another '''
+
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    elif os.path.exists(target):
+        os.remove(target)
+    if os.path.isdir(source):
+        shutil.copytree(source, target)
+    else:
+        shutil.copy(source, target)
+
+
+def benchmark_discovery(image_folder, directory, repeat):
+    ''' Time listing images, scanning the folder and from a cached manifest '''
+
+    manifest_folder = os.path.join(directory, 'manifests')
+    num_images = len(get_image_names(image_folder, extensions=IMAGE_EXTENSIONS, manifest_folder=manifest_folder))
+    list_images = lambda: get_image_names(image_folder, extensions=IMAGE_EXTENSIONS, manifest_folder=manifest_folder)
+
+    return {'get_image_names.scan': (best_of(list_images, repeat, lambda: shutil.rmtree(manifest_folder, True)), num_images),
+            'get_image_names.cached': (best_of(list_images, repeat), num_images)}
+
+
+def benchmark_datastores(annotations_csv, directory, num_appends, repeat):
+    ''' Time resuming from, appending to, rewriting and compacting every kind of datastore '''
+
+    results = {}
+    source = Datastore(annotations_csv, training=True, read_only=True)
+    annotations, statuses, _ = source.load()
+    filenames = source.get_filenames()
+    appended = random_poses(num_appends, seed=1)
+
+    for backend, file_name in sorted(BACKENDS.items()):
+        original = os.path.join(directory, 'original_' + file_name)
+        working = os.path.join(directory, file_name)
+        convert_datastore(source, open_datastore(original, training=True))
+        reset = lambda: copy_store(original, working)
+
+        def append():
+            datastore = open_datastore(working, training=True)
+            for i, annotation in enumerate(appended):
+                datastore.save_annotation(i, filenames[i], annotation, 'True')
+
+        results['datastore.{}.resume'.format(backend)] = (
+            best_of(lambda: open_datastore(working, training=True).load(), repeat, reset), len(statuses))
+        results['datastore.{}.save_annotation'.format(backend)] = (best_of(append, repeat, reset), num_appends)
+        results['datastore.{}.save_annotations'.format(backend)] = (
+            best_of(lambda: open_datastore(working, training=True).save_annotations(filenames, annotations, statuses),
+                    repeat, reset), len(statuses))
+
+        def append_then_reset():
+            reset()
+            append()
+
+        results['datastore.{}.compact'.format(backend)] = (
+            best_of(lambda: open_datastore(working, training=True).compact(), repeat, append_then_reset), len(statuses))
+
+    return results
+
+
+def benchmark_images(paths, max_size, repeat):
+    ''' Time computing display sizes, decoding images and loading them through a cold and a warm image cache '''
+
+    sizes = [(width, height) for width in range(100, 8000, 79) for height in range(100, 6000, 97)]
+    cache = ImageCache(max_size, workers=1)
+    warm_cache = lambda: [cache.get(path) for path in paths]
+    warm_cache()
+
+    results = {'get_resized_size': (best_of(lambda: [get_resized_size(size, max_size) for size in sizes], repeat),
+                                    len(sizes)),
+               'decode_image': (best_of(lambda: [decode_image(path, max_size) for path in paths], repeat), len(paths)),
+               'image_cache.get.warm': (best_of(warm_cache, repeat), len(paths))}
+    cache.close()
+
+    return results
+
+
+def benchmark_training_margin(num_rows, repeat):
+    ''' Time checking keypoints against the training margin one click at a time and for whole arrays at once '''
+
+    reference = random_poses(num_rows, seed=2)
+    coordinates = reference + np.random.default_rng(3).normal(0, 0.02, reference.shape)
+    clicks = list(zip(coordinates.reshape(-1, 2).tolist(), reference.reshape(-1, 2).tolist()))
+
+    def per_click():
+        margin = TRAINING_MARGIN
+        return [(abs(normalized_x - ground_truth_x) < margin) and (abs(normalized_y - ground_truth_y) < margin)
+                for (normalized_x, normalized_y), (ground_truth_x, ground_truth_y) in clicks]
+
+    return {'training_margin.per_click': (best_of(per_click, repeat), len(clicks)),
+            'training_margin.vectorised': (best_of(lambda: within_margin(coordinates, reference), repeat), len(clicks))}
+
+
+def compare(results, previous_path):
+    ''' Print the change of every result relative to an earlier results file '''
+
+    with open(previous_path, 'r') as f:
+        previous = json.load(f)
+    print("\nCompared to {} ({})".format(previous_path, previous['environment'].get('commit', '')[:10]))
+    for name, result in results.items():
+        if name in previous['results']:
+            ratio = result['seconds'] / max(previous['results'][name]['seconds'], 1e-12)
+            flag = '  REGRESSION' if ratio > REGRESSION_THRESHOLD else ''
+            print("{:<36}{:>8.2f}x{}".format(name, ratio, flag))
+
+
+def main(args):
+    ''' Run headless benchmarks on synthetic data and write results to a json file '''
+
+    with tempfile.TemporaryDirectory() as directory:
+        image_folder = os.path.join(directory, 'images')
+        annotations_csv = os.path.join(directory, 'synthetic.csv')
+        paths = write_images(image_folder, args.images, (args.width, args.height), args.format, args.subfolders)
+        write_annotations(annotations_csv, args.rows)
+
+        timings = {}
+        timings.update(benchmark_discovery(image_folder, directory, args.repeat))
+        timings.update(benchmark_datastores(annotations_csv, directory, args.appends, args.repeat))
+        timings.update(benchmark_images(paths, (args.screen_width, args.screen_height), args.repeat))
+        timings.update(benchmark_training_margin(args.rows, args.repeat))
+
+    results = {name: {'seconds': seconds, 'items': items, 'us_per_item': seconds * 1e6 / max(items, 1)}
+               for name, (seconds, items) in timings.items()}
+    print("{:<36}{:>12}{:>10}{:>14}".format('Benchmark', 'Seconds', 'Items', 'us per item'))
+    for name, result in results.items():
+        print("{:<36}{:>12.4f}{:>10}{:>14.2f}".format(name, result['seconds'], result['items'], result['us_per_item']))
+
+    if args.compare:
+        compare(results, args.compare)
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': get_environment(), 'parameters': vars(args), 'results': results}, f, indent=2)
+    print("\nResults written to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000, help='Number of rows of the synthetic annotation csv file')
+    parser.add_argument('--appends', type=int, default=1000, help='Number of single annotations appended to every datastore')
+    parser.add_argument('--images', type=int, default=50, help='Number of synthetic images')
+    parser.add_argument('--width', type=int, default=1920, help='Width of synthetic images')
+    parser.add_argument('--height', type=int, default=1080, help='Height of synthetic images')
+    parser.add_argument('--format', type=str, default='jpg', choices=sorted(IMAGE_FORMATS), help='Format of synthetic images')
+    parser.add_argument('--subfolders', type=int, default=5, help='Number of subfolders to spread images over')
+    parser.add_argument('--screen-width', type=int, default=1920, dest='screen_width', help='Width of the image area')
+    parser.add_argument('--screen-height', type=int, default=918, dest='screen_height', help='Height of the image area')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of repetitions, the fastest is reported')
+    parser.add_argument('--output', type=str, default='benchmark_results.json', help='Path of json file to write results to')
+    parser.add_argument('--compare', type=str, help='Path of an earlier results file to compare against')
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,85 @@
+import os
+import sys
+import argparse
+import numpy as np
+from PIL import Image, ImageChops
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datastore import Datastore
+from skeleton import NUM_BODY_PARTS
+
+
+FRAMES_PER_VIDEO = 100
+IMAGE_FORMATS = {'jpg': 'JPEG', 'png': 'PNG'}
+
+
+def get_frame_name(i, frames_per_video=FRAMES_PER_VIDEO, extension='jpg'):
+    ''' Returns the name of the i-th synthetic image, as frame video[NNNN] of a numbered video '''
+
+    return 'video_{:05d}[{:04d}].{}'.format(i // frames_per_video, i % frames_per_video, extension)
+
+
+def write_images(folder, num_images, size, extension='jpg', subfolders=0, frames_per_video=FRAMES_PER_VIDEO):
+    ''' Write images of the given size with structured content and noise, spread over a number of subfolders '''
+
+    noise = Image.effect_noise(size, 40)
+    gradient = Image.linear_gradient('L').resize(size)
+    paths = []
+    for i in range(num_images):
+        directory = os.path.join(folder, 'part_{:03d}'.format(i % subfolders)) if subfolders else folder
+        os.makedirs(directory, exist_ok=True)
+
+        # Vary the content by rolling the noise, such that images do not compress alike
+        img = Image.merge('RGB', (ImageChops.offset(noise, i * 37, i * 17), gradient,
+                                  gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+        path = os.path.join(directory, get_frame_name(i, frames_per_video, extension))
+        img.save(path, IMAGE_FORMATS[extension], **({'quality': 90} if extension == 'jpg' else {}))
+        paths.append(path)
+
+    return paths
+
+
+def random_poses(num_rows, seed=42):
+    ''' Returns normalized coordinates of shape (num_rows, NUM_BODY_PARTS, 2) scattered around a random center '''
+
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0.3, 0.7, (num_rows, 1, 2))
+    return np.clip(centers + rng.normal(0, 0.1, (num_rows, NUM_BODY_PARTS, 2)), 0.0, 1.0)
+
+
+def write_annotations(file_name, num_rows, seed=42, frames_per_video=FRAMES_PER_VIDEO, status='True'):
+    ''' Write a csv file with random annotations of the given number of rows, with the header of Datastore '''
+
+    headers = Datastore(file_name, training=True, read_only=True).headers
+    row_format = '{},' + '{},' + ','.join(['"({!r}, {!r})"'] * NUM_BODY_PARTS) + ',{}\n'
+    coordinates = random_poses(num_rows, seed).reshape(num_rows, -1).tolist()
+    with open(file_name, 'w') as f:
+        f.write(','.join(headers) + '\n')
+        for i, row in enumerate(coordinates):
+            f.write(row_format.format(i, get_frame_name(i, frames_per_video), *row, status))
+
+
+def main(args):
+    ''' Generate a synthetic image folder and annotation csv file '''
+
+    if args.images:
+        write_images(args.image_folder, args.images, (args.width, args.height), args.format, args.subfolders)
+        print("Wrote {} {}x{} images to {}".format(args.images, args.width, args.height, args.image_folder))
+    if args.rows:
+        write_annotations(args.annotations, args.rows)
+        print("Wrote {} annotations to {}".format(args.rows, args.annotations))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--image-folder', type=str, default='synthetic_images', dest='image_folder', help='Folder to write images to')
+    parser.add_argument('--images', type=int, default=0, help='Number of images')
+    parser.add_argument('--width', type=int, default=1920, help='Width of images')
+    parser.add_argument('--height', type=int, default=1080, help='Height of images')
+    parser.add_argument('--format', type=str, default='jpg', choices=sorted(IMAGE_FORMATS), help='Image format')
+    parser.add_argument('--subfolders', type=int, default=0, help='Number of subfolders to spread images over')
+    parser.add_argument('--annotations', type=str, default='synthetic_annotations.csv', help='Path of annotation csv file to write')
+    parser.add_argument('--rows', type=int, default=0, help='Number of annotated images')
+    args = parser.parse_args()
+
+    main(args)
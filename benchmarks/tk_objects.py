@@ -0,0 +1,74 @@
+import os
+import sys
+import argparse
+import tempfile
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gui import Annotate, BASE_DIR
+from datastore import LEASE_BATCH_SIZE, BACKUP_KEEP_LAST, BACKUP_KEEP_HOURLY, BACKUP_KEEP_DAILY
+from discovery import IMAGE_EXTENSIONS
+from defaults import PREFETCH_DISTANCE, IMAGE_CACHE_MB
+
+
+def count_objects(annotate):
+    ''' Returns the number of canvas items, named fonts, images and Tcl commands of the annotation program '''
+
+    counts = annotate.layer.object_counts()
+    counts['commands'] = len(annotate.root.tk.splitlist(annotate.root.tk.call('info', 'commands')))
+    return counts
+
+
+def main(args):
+    ''' Check that the number of Tk objects stays constant while changing image many times '''
+
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        raise SystemExit("A display is required to count Tk objects")
+
+    with tempfile.TemporaryDirectory() as directory:
+        annotate_args = argparse.Namespace(
+            image_folder=args.image_folder, annotations=os.path.join(directory, 'annotations.csv'),
+            extensions=IMAGE_EXTENSIONS, prefetch=PREFETCH_DISTANCE, image_cache_mb=IMAGE_CACHE_MB, resample='balanced',
+            display_cache=os.path.join(directory, 'display_cache'), pool=None, annotator='benchmark',
+            lease_batch_size=LEASE_BATCH_SIZE, backup_keep_last=BACKUP_KEEP_LAST, backup_keep_hourly=BACKUP_KEEP_HOURLY,
+            backup_keep_daily=BACKUP_KEEP_DAILY, event_log='', metrics=False, metrics_folder=None,
+            predictor=None, track=False, keyframe_interval=None, duplicates=None)
+        annotate = Annotate(root, annotate_args, training=True)
+        num_images = len(annotate.thumbnails)
+
+        def change_images(num_changes):
+            for i in range(num_changes):
+                annotate.thumbnail_index = i % num_images
+                annotate.update_image()
+                if i % args.completed_every == 0:
+                    annotate.show_completed_screen()
+                    annotate.hide_completed_screen()
+                root.update_idletasks()
+
+        # Every item is created during the first round of images
+        change_images(num_images)
+        before = count_objects(annotate)
+        change_images(args.changes)
+        after = count_objects(annotate)
+
+        annotate.image_cache.close()
+        root.destroy()
+
+    print("{:<14}{:>10}{:>10}".format('Tk objects', 'Before', 'After'))
+    for name in before:
+        print("{:<14}{:>10}{:>10}".format(name, before[name], after[name]))
+    if after != before:
+        raise SystemExit("Tk objects grew during {} image changes".format(args.changes))
+    print("Tk objects are constant over {} image changes".format(args.changes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--image-folder', type=str, default=os.path.join(BASE_DIR, 'images'), dest='image_folder', help='Path of folder with images to cycle through')
+    parser.add_argument('--changes', type=int, default=1000, help='Number of image changes')
+    parser.add_argument('--completed-every', type=int, default=10, dest='completed_every', help='Show and hide the completion screen every this many image changes')
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,71 @@
+import os
+import sys
+import argparse
+import timeit
+import numpy as np
+from PIL import Image, ImageChops, ImageFilter, ImageOps
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from skeleton import NUM_BODY_PARTS
+from track import track_keypoints
+
+
+def textured_image(size, seed):
+    ''' Returns an image with texture at several scales, such that points can be tracked at every pyramid level '''
+
+    layers = [Image.effect_noise(size, 60).filter(ImageFilter.GaussianBlur(radius)) for radius in (1, 4, 12)]
+    img = ImageChops.add(ImageChops.add(layers[0], layers[1], scale=2.0), layers[2], scale=1.0)
+    return ImageOps.autocontrast(ImageChops.offset(img, seed * 101, seed * 53), cutoff=1).convert('RGB')
+
+
+def main(args):
+    ''' Compare keypoints tracked through a synthetic video with keypoints copied from the previous frame '''
+
+    size = (args.width, args.height)
+    rng = np.random.default_rng(0)
+    coordinates = rng.uniform(0.2, 0.8, (NUM_BODY_PARTS, 2))
+
+    # Frames are crops of a larger image, moving back and forth by up to the given speed in pixels per frame
+    phases = rng.uniform(0, 2 * np.pi, 2)
+    steps = np.arange(args.frames + 1)[:, None]
+    offsets = np.round(args.speed * args.period / (2 * np.pi) * (1 - np.cos(2 * np.pi * steps / args.period + phases)))
+    margin = int(np.abs(offsets).max()) + 1
+    base = textured_image((args.width + 2 * margin, args.height + 2 * margin), seed=1)
+    frames = [base.crop((margin + int(x), margin + int(y), margin + int(x) + args.width, margin + int(y) + args.height))
+              for x, y in offsets]
+
+    tracked_errors = []
+    copied_errors = []
+    seconds = []
+    for i in range(1, len(frames)):
+        # Content moves opposite to the crop. Track from the true keypoints of the previous frame, as confirmed
+        previous_truth = coordinates - offsets[i - 1] / size
+        truth = coordinates - offsets[i] / size
+        start = timeit.default_timer()
+        tracked = track_keypoints(frames[i - 1], frames[i], previous_truth)
+        seconds.append(timeit.default_timer() - start)
+
+        tracked_errors.append(np.linalg.norm((tracked - truth) * size, axis=1))
+        copied_errors.append(np.linalg.norm((previous_truth - truth) * size, axis=1))
+
+    tracked_errors = np.concatenate(tracked_errors)
+    copied_errors = np.concatenate(copied_errors)
+    print("{} frames of {}x{} moving up to {} pixels per frame".format(args.frames, args.width, args.height, args.speed))
+    print("{:>8}: median error {:6.2f} px, within {} px {:6.1%}".format(
+        'copied', np.median(copied_errors), args.tolerance, np.mean(copied_errors <= args.tolerance)))
+    print("{:>8}: median error {:6.2f} px, within {} px {:6.1%}, {:.1f} ms per frame".format(
+        'tracked', np.median(tracked_errors), args.tolerance, np.mean(tracked_errors <= args.tolerance),
+        np.median(seconds) * 1e3))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=50, help='Number of frames')
+    parser.add_argument('--width', type=int, default=1600, help='Width of frames as displayed')
+    parser.add_argument('--height', type=int, default=900, help='Height of frames as displayed')
+    parser.add_argument('--speed', type=float, default=15.0, help='Largest motion in pixels per frame')
+    parser.add_argument('--period', type=float, default=20.0, help='Number of frames of a back and forth motion')
+    parser.add_argument('--tolerance', type=float, default=2.0, help='Distance in pixels at which a keypoint needs no correction')
+    args = parser.parse_args()
+
+    main(args)
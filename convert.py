@@ -0,0 +1,21 @@
+import argparse
+
+from datastore import open_datastore, convert_datastore
+
+
+def main(args):
+    ''' Convert annotations between csv files, binary stores and SQLite databases '''
+
+    source = open_datastore(args.source, read_only=True)
+    target = open_datastore(args.target, training=True)
+    num_images = convert_datastore(source, target)
+    print("Converted {} images from {} to {}".format(num_images, args.source, args.target))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', type=str, required=True, help="Path of annotations to convert, a csv file, a folder ending with '.kpt' or a SQLite database")
+    parser.add_argument('--target', type=str, required=True, help="Path of annotations to write, a csv file, a folder ending with '.kpt' or a SQLite database")
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,812 @@
+import os
+import csv
+import gzip
+import shutil
+import hashlib
+import threading
+import contextlib
+import time
+import json
+from datetime import datetime
+
+from skeleton import BODY_PART_NAMES, NUM_BODY_PARTS
+
+
+CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
+CSV_PATH = os.path.join(CURRENT_DIR, 'annotations.csv')
+BINARY_STORE_SUFFIX = '.kpt'
+SQLITE_SUFFIXES = ('.sqlite', '.db')
+BACKUP_PATH = os.path.join(CURRENT_DIR, 'backups')
+JOURNAL_SUFFIX = '.journal'
+MERGING_SUFFIX = '.merging'
+JOURNAL_COMPACT_THRESHOLD = 4 * 1024 * 1024
+COORDINATE_TRANSLATION = str.maketrans('(),', '   ')
+LOAD_CHUNK_SIZE = 65536
+DRAFT_STATUS = 'draft'
+INTERPOLATED_STATUS = 'interpolated'
+DUPLICATE_STATUS = 'duplicate'
+STATUS_CODES = ['', 'True', DRAFT_STATUS, INTERPOLATED_STATUS, DUPLICATE_STATUS]
+BACKUP_SUFFIX = '_annotations_backup.csv'
+BACKUP_TIME_FORMAT = '%Y%m%d-%H%M%S'
+BACKUP_KEEP_LAST = 10
+BACKUP_KEEP_HOURLY = 24
+BACKUP_KEEP_DAILY = 30
+LEASE_BATCH_SIZE = 50
+LEASE_DURATION = 15 * 60
+FLOAT32_SIZE = 4
+
+
+class Datastore:
+    ''' A simple class to handle writing of annotations (i.e., coordinates for body parts) into a csv file format
+
+    Single annotations are appended to a journal next to the csv file, which is replayed on top of the csv snapshot
+    when reading. The journal is merged back into the snapshot when the datastore is opened and closed, and in a
+    background thread once it grows beyond a size threshold, while new annotations go to a fresh journal.
+    '''
+
+    def __init__(self, file_name=CSV_PATH, training=False, compact_threshold=JOURNAL_COMPACT_THRESHOLD, backups=None,
+                 lease_pool=None, read_only=False):
+        self.file_name = file_name
+        self.lease_pool = lease_pool
+        self.journal_name = file_name + JOURNAL_SUFFIX
+        self.merging_name = file_name + MERGING_SUFFIX
+        self.compact_threshold = compact_threshold
+        self.lock = threading.Lock()
+        self.compaction = None
+        self.headers = ["index", "file"] + [body_part.lower().replace(' ', '_') for body_part in BODY_PART_NAMES] + ["done"]
+
+        # Leave files untouched, e.g. while annotation is in progress in another process
+        if read_only:
+            return
+
+        # Make empty csv file if it does not already exist
+        if not os.path.isfile(file_name):
+            with open(file_name, 'w') as f:
+                writer = csv.DictWriter(
+                    f, fieldnames=self.headers)
+                writer.writeheader()
+
+        # Merge journal of a previous session into the csv file
+        self.compact()
+
+        if (not training) and file_name == CSV_PATH:
+            # Make a copy of the existing csv file without delaying startup
+            self.backups = backups or Backups()
+            self.backups.create_in_background(file_name)
+
+    def save_annotations(self, filenames, annotations, statuses):
+        ''' Write elements in the datastore to csv file '''
+
+        rows = [[i, filename] + format_annotation(annotation) + [status]
+                for i, (filename, annotation, status) in enumerate(zip(filenames, annotations, statuses))]
+        self._wait_for_compaction()
+        self._write_rows(rows)
+
+    def save_annotation(self, index, filename, annotation, status):
+        ''' Append a single element to the journal of the datastore '''
+
+        # Only images held from a shared pool may be written
+        if self.lease_pool is not None and not self.lease_pool.holds(filename):
+            raise LeaseError('{} is not leased by {}'.format(filename, self.lease_pool.owner))
+
+        # Every row reaches the disk before returning, such that a crash cuts off at most the row being written
+        with self.lock:
+            with open(self.journal_name, 'a') as f:
+                writer = csv.writer(f)
+                writer.writerow([index, filename] + format_annotation(annotation) + [status])
+                f.flush()
+                os.fsync(f.fileno())
+                journal_size = f.tell()
+
+        # Merge journal into the csv file without blocking annotation when it has grown too large
+        if journal_size > self.compact_threshold and (self.compaction is None or not self.compaction.is_alive()):
+            self.compaction = threading.Thread(target=self._compact_in_background, daemon=True)
+            self.compaction.start()
+
+    def compact(self):
+        ''' Merge the journal into the csv file, rewriting the csv file only if there is a journal '''
+
+        self._wait_for_compaction()
+        if os.path.isfile(self.journal_name) or os.path.isfile(self.merging_name):
+            self._write_rows(self._read_rows())
+
+    def _compact_in_background(self):
+        ''' Merge the journal into the csv file while new annotations are appended to a fresh journal '''
+
+        # A journal left over by an interrupted merge is merged together with the current journal
+        with self.lock:
+            if not os.path.isfile(self.merging_name):
+                os.replace(self.journal_name, self.merging_name)
+
+        # Rows of the fresh journal merged along are harmless, as replaying them again gives the same rows
+        self._write_rows(self._read_rows(), [self.merging_name])
+
+    def _wait_for_compaction(self):
+        ''' Block until a merge running in the background has finished '''
+
+        if self.compaction is not None:
+            self.compaction.join()
+            self.compaction = None
+
+    def load(self):
+        ''' Returns coordinates as an array of shape (N, NUM_BODY_PARTS, 2), statuses and index of the last
+        annotated picture, parsed from a single pass over the datastore '''
+
+        # Import numpy only when annotations are read, such that commands handling backups and pools start faster
+        import numpy as np
+
+        annotations = [np.empty((0, NUM_BODY_PARTS, 2), dtype=np.float64)]
+        statuses = []
+        last_index = -1
+        for rows in self._iter_chunks(LOAD_CHUNK_SIZE):
+            annotations.append(parse_coordinates(rows))
+            for row in rows:
+                statuses.append(row[-1])
+                if row[-1] == 'True':
+                    last_index = int(row[0])
+
+        return np.concatenate(annotations), statuses, last_index
+
+    def iter_annotations(self, chunk_size=LOAD_CHUNK_SIZE):
+        ''' Yields chunks of file names, coordinates as an array of shape (n, NUM_BODY_PARTS, 2) and statuses, reading
+        the datastore as a stream '''
+
+        for rows in self._iter_chunks(chunk_size):
+            yield [row[1] for row in rows], parse_coordinates(rows), [row[-1] for row in rows]
+
+    def _write_rows(self, rows, journal_names=None):
+        ''' Replace the csv file by the given rows and remove the journals merged into them, by default all journals '''
+
+        # Write to a temporary file first to never leave a truncated csv file behind
+        temporary_name = self.file_name + '.tmp'
+        with open(temporary_name, 'w') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.headers)
+            writer.writerows(rows)
+
+        # Every journaled annotation is now part of the csv file
+        with self.lock:
+            os.replace(temporary_name, self.file_name)
+            for journal_name in journal_names or [self.merging_name, self.journal_name]:
+                if os.path.isfile(journal_name):
+                    os.remove(journal_name)
+
+    def _read_journal(self, journal_name):
+        ''' Returns the rows of a journal by index, leaving out a row cut off by a crash while it was written '''
+
+        rows = {}
+        if not os.path.isfile(journal_name):
+            return rows
+
+        # Complete rows end with a newline and have a cell for every header
+        with open(journal_name, 'r') as f:
+            lines = [line for line in f if line.endswith('\n')]
+        for row in csv.reader(lines):
+            if len(row) == len(self.headers) and row[0].isdigit():
+                rows[int(row[0])] = row
+        return rows
+
+    def _read_rows(self):
+        ''' Returns a list of all elements in the datastore, represented as lists ordered as the headers '''
+
+        return list(self._iter_rows())
+
+    def _iter_rows(self):
+        ''' Yields all elements in the datastore, represented as lists ordered as the headers '''
+
+        # Journaled elements replace or follow the elements of the csv file. The journals and the csv file are opened
+        # together, such that a merge in the background never leaves rows out or replays them on an older csv file
+        with self.lock:
+            journal = self._read_journal(self.merging_name)
+            journal.update(self._read_journal(self.journal_name))
+            f = open(self.file_name, 'r')
+
+        with f:
+            reader = csv.reader(f)
+            headers = next(reader, self.headers)
+
+            # Reorder columns of csv files written with other headers (e.g. without completion statuses)
+            columns = None
+            if headers != self.headers:
+                columns = [headers.index(header) if header in headers else None for header in self.headers]
+
+            num_rows = 0
+            for row in reader:
+                if columns is not None:
+                    row = [row[column] if column is not None else '' for column in columns]
+                yield journal.pop(num_rows, row)
+                num_rows += 1
+
+        for index in sorted(journal):
+            yield journal[index]
+
+    def _iter_chunks(self, chunk_size):
+        ''' Yields lists of at most chunk_size elements in the datastore '''
+
+        chunk = []
+        for row in self._iter_rows():
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _read_file(self):
+        ''' Returns a list of all elements in the datastore, represented as dictionaries '''
+
+        return [dict(zip(self.headers, row)) for row in self._read_rows()]
+
+    def get_annotations(self):
+        ''' Returns a list of all images in the datastore, represented as list containing coordinates '''
+
+        annotations, _, _ = self.load()
+        return [[tuple(coordinate) for coordinate in annotation] for annotation in annotations.tolist()]
+
+    def get_filenames(self):
+        ''' Returns a list of all images in the datastore, represented as file names '''
+
+        return [row[1] for row in self._read_rows()]
+
+    def get_statuses(self):
+        ''' Returns a list of all images in the datastore, represented as list containing completion statuses '''
+
+        return [row[-1] for row in self._read_rows()]
+
+    def get_last_thumbnail_index(self):
+        '''Returns the stored index of the last annotated picture'''
+
+        # Only indices and statuses are needed, coordinates are left unparsed
+        last_index = -1
+        for row in self._iter_rows():
+            if row[-1] == 'True':
+                last_index = int(row[0])
+        return last_index
+
+
+class BinaryDatastore:
+    ''' Annotations stored as fixed-width binary rows, such that writing a single image only overwrites its own row
+
+    The store is a folder with coordinates as float32 rows of shape (NUM_BODY_PARTS, 2), one status byte per row, file
+    names (one per line) and a header holding the number of rows and the index of the last annotated picture.
+    '''
+
+    def __init__(self, folder, training=False, backups=None, lease_pool=None, read_only=False):
+        self.folder = folder
+        self.lease_pool = lease_pool
+        self.coordinates_name = os.path.join(folder, 'coordinates.f32')
+        self.statuses_name = os.path.join(folder, 'statuses.u8')
+        self.filenames_name = os.path.join(folder, 'files.txt')
+        self.header_name = os.path.join(folder, 'header.json')
+        self.row_size = NUM_BODY_PARTS * 2 * FLOAT32_SIZE
+
+        # Make empty store if it does not already exist
+        if not read_only and not os.path.isfile(self.header_name):
+            os.makedirs(folder, exist_ok=True)
+            for file_name in [self.coordinates_name, self.statuses_name, self.filenames_name]:
+                open(file_name, 'wb').close()
+            self._write_header({'count': 0, 'last_index': -1, 'filenames_size': 0})
+
+    def save_annotations(self, filenames, annotations, statuses):
+        ''' Replace all elements in the datastore '''
+
+        import numpy as np
+
+        coordinates = np.asarray(annotations, dtype=np.float32).reshape(-1, NUM_BODY_PARTS, 2)
+        status_codes = np.array([STATUS_CODES.index(status) for status in statuses], dtype=np.uint8)
+        filenames_buffer = ''.join([filename + '\n' for filename in filenames]).encode('utf-8')
+
+        coordinates.tofile(self.coordinates_name)
+        status_codes.tofile(self.statuses_name)
+        with open(self.filenames_name, 'wb') as f:
+            f.write(filenames_buffer)
+
+        done = np.flatnonzero(status_codes == STATUS_CODES.index('True'))
+        self._write_header({'count': len(status_codes), 'last_index': int(done[-1]) if len(done) else -1,
+                            'filenames_size': len(filenames_buffer)})
+
+    def save_annotation(self, index, filename, annotation, status):
+        ''' Overwrite or append a single element of the datastore. An interrupted append leaves the previous state, an
+            interrupted overwrite may leave the new coordinates with the old status or last annotated index '''
+
+        import numpy as np
+
+        # Only images held from a shared pool may be written
+        if self.lease_pool is not None and not self.lease_pool.holds(filename):
+            raise LeaseError('{} is not leased by {}'.format(filename, self.lease_pool.owner))
+
+        header = self._read_header()
+        if index > header['count']:
+            raise IndexError('Element {} is written before element {}'.format(index, header['count']))
+
+        # New file names are written after the last complete name, dropping any name left by an interrupted write
+        if index == header['count']:
+            with open(self.filenames_name, 'r+b') as f:
+                f.seek(header['filenames_size'])
+                f.write((filename + '\n').encode('utf-8'))
+                f.truncate()
+                header['filenames_size'] = f.tell()
+            header['count'] += 1
+
+        # Overwrite the row and status of the element in place
+        row = np.asarray(annotation, dtype=np.float32).reshape(NUM_BODY_PARTS, 2)
+        with open(self.coordinates_name, 'r+b') as f:
+            f.seek(index * self.row_size)
+            f.write(row.tobytes())
+        with open(self.statuses_name, 'r+b') as f:
+            f.seek(index)
+            f.write(bytes([STATUS_CODES.index(status)]))
+
+        # Maintain index of the last annotated picture
+        if status == 'True' and index > header['last_index']:
+            header['last_index'] = index
+        elif status != 'True' and index == header['last_index']:
+            done = np.flatnonzero(self._read_status_codes(header['count'])[:index] == STATUS_CODES.index('True'))
+            header['last_index'] = int(done[-1]) if len(done) else -1
+
+        # The header is written last, such that an interrupted append leaves the previous number of rows. Overwritten
+        # rows are not protected, as their coordinates and status are already written in place
+        self._write_header(header)
+
+    def compact(self):
+        ''' Nothing to merge, as every element is written in place '''
+
+    def load(self):
+        ''' Returns coordinates as an array of shape (N, NUM_BODY_PARTS, 2) mapped from disk without copying, statuses
+        and index of the last annotated picture '''
+
+        header = self._read_header()
+        return self._map_coordinates(header['count']), self._read_statuses(header['count']), header['last_index']
+
+    def iter_annotations(self, chunk_size=LOAD_CHUNK_SIZE):
+        ''' Yields chunks of file names, coordinates as an array of shape (n, NUM_BODY_PARTS, 2) and statuses '''
+
+        # File names and statuses are read a chunk at a time along with the mapped coordinates, such that memory use
+        # does not grow with the size of the datastore
+        header = self._read_header()
+        coordinates = self._map_coordinates(header['count'])
+        with open(self.filenames_name, 'rb') as filenames, open(self.statuses_name, 'rb') as status_codes:
+            for start in range(0, header['count'], chunk_size):
+                end = min(start + chunk_size, header['count'])
+                yield ([filenames.readline().rstrip(b'\n').decode('utf-8') for _ in range(end - start)],
+                       coordinates[start:end], [STATUS_CODES[code] for code in status_codes.read(end - start)])
+
+    def get_annotations(self):
+        ''' Returns a list of all images in the datastore, represented as list containing coordinates '''
+
+        annotations, _, _ = self.load()
+        return [[tuple(coordinate) for coordinate in annotation] for annotation in annotations.tolist()]
+
+    def get_filenames(self):
+        ''' Returns a list of all images in the datastore, represented as file names '''
+
+        header = self._read_header()
+        with open(self.filenames_name, 'rb') as f:
+            return f.read(header['filenames_size']).decode('utf-8').splitlines()
+
+    def get_statuses(self):
+        ''' Returns a list of all images in the datastore, represented as list containing completion statuses '''
+
+        return self._read_statuses(self._read_header()['count'])
+
+    def get_last_thumbnail_index(self):
+        '''Returns the stored index of the last annotated picture'''
+
+        return self._read_header()['last_index']
+
+    def _map_coordinates(self, count):
+        ''' Returns coordinates mapped copy-on-write, such that changes in memory never reach the disk '''
+
+        import numpy as np
+
+        if count == 0:
+            return np.empty((0, NUM_BODY_PARTS, 2), dtype=np.float32)
+        return np.memmap(self.coordinates_name, dtype=np.float32, mode='c', shape=(count, NUM_BODY_PARTS, 2))
+
+    def _read_status_codes(self, count):
+        import numpy as np
+
+        return np.fromfile(self.statuses_name, dtype=np.uint8, count=count)
+
+    def _read_statuses(self, count):
+        return [STATUS_CODES[code] for code in self._read_status_codes(count).tolist()]
+
+    def _read_header(self):
+        with open(self.header_name, 'r') as f:
+            return json.load(f)
+
+    def _write_header(self, header):
+        temporary_name = self.header_name + '.tmp'
+        with open(temporary_name, 'w') as f:
+            json.dump(header, f)
+        os.replace(temporary_name, self.header_name)
+
+
+class SQLiteDatastore:
+    ''' Annotations stored in a SQLite database in WAL mode, with one row per image updated in its own transaction '''
+
+    def __init__(self, file_name, training=False, backups=None, lease_pool=None, read_only=False):
+        # Import SQLite only when used, such that csv and binary datastores start faster
+        import sqlite3
+
+        self.file_name = file_name
+        self.lease_pool = lease_pool
+
+        if read_only:
+            self.connection = sqlite3.connect('file:{}?mode=ro'.format(file_name), uri=True, isolation_level=None)
+            return
+
+        # Transactions are handled explicitly, and committed transactions survive crashes and power loss
+        self.connection = sqlite3.connect(file_name, timeout=60, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = FULL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS annotations (position INTEGER PRIMARY KEY, '
+                                'file TEXT NOT NULL, coordinates BLOB NOT NULL, done TEXT NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS annotations_file ON annotations (file)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS annotations_done ON annotations (done, position)')
+
+    def save_annotations(self, filenames, annotations, statuses):
+        ''' Replace all elements in the datastore '''
+
+        with transaction(self.connection):
+            self.connection.execute('DELETE FROM annotations')
+            self.connection.executemany(
+                'INSERT INTO annotations (position, file, coordinates, done) VALUES (?, ?, ?, ?)',
+                ((i, filename, encode_coordinates(annotation), status)
+                 for i, (filename, annotation, status) in enumerate(zip(filenames, annotations, statuses))))
+
+    def save_annotation(self, index, filename, annotation, status):
+        ''' Insert or update a single element of the datastore '''
+
+        # Only images held from a shared pool may be written
+        if self.lease_pool is not None and not self.lease_pool.holds(filename):
+            raise LeaseError('{} is not leased by {}'.format(filename, self.lease_pool.owner))
+
+        with transaction(self.connection):
+            self.connection.execute(
+                'INSERT INTO annotations (position, file, coordinates, done) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (position) DO UPDATE SET file = excluded.file, coordinates = excluded.coordinates, '
+                'done = excluded.done', (index, filename, encode_coordinates(annotation), status))
+
+    def compact(self):
+        ''' Merge the write-ahead log into the database '''
+
+        self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def load(self):
+        ''' Returns coordinates as an array of shape (N, NUM_BODY_PARTS, 2), statuses and index of the last
+        annotated picture '''
+
+        rows = self.connection.execute('SELECT coordinates, done FROM annotations ORDER BY position').fetchall()
+        annotations = decode_coordinates([coordinates for coordinates, _ in rows])
+        return annotations, [status for _, status in rows], self.get_last_thumbnail_index()
+
+    def iter_annotations(self, chunk_size=LOAD_CHUNK_SIZE):
+        ''' Yields chunks of file names, coordinates as an array of shape (n, NUM_BODY_PARTS, 2) and statuses '''
+
+        cursor = self.connection.execute('SELECT file, coordinates, done FROM annotations ORDER BY position')
+        for rows in iter(lambda: cursor.fetchmany(chunk_size), []):
+            yield [row[0] for row in rows], decode_coordinates([row[1] for row in rows]), [row[2] for row in rows]
+
+    def get_annotations(self):
+        ''' Returns a list of all images in the datastore, represented as list containing coordinates '''
+
+        rows = self.connection.execute('SELECT coordinates FROM annotations ORDER BY position').fetchall()
+        annotations = decode_coordinates([coordinates for coordinates, in rows])
+        return [[tuple(coordinate) for coordinate in annotation] for annotation in annotations.tolist()]
+
+    def get_filenames(self):
+        ''' Returns a list of all images in the datastore, represented as file names '''
+
+        return [filename for filename, in self.connection.execute('SELECT file FROM annotations ORDER BY position')]
+
+    def get_statuses(self):
+        ''' Returns a list of all images in the datastore, represented as list containing completion statuses '''
+
+        return [status for status, in self.connection.execute('SELECT done FROM annotations ORDER BY position')]
+
+    def get_last_thumbnail_index(self):
+        '''Returns the stored index of the last annotated picture'''
+
+        last_index, = self.connection.execute("SELECT MAX(position) FROM annotations WHERE done = 'True'").fetchone()
+        return -1 if last_index is None else last_index
+
+
+class Backups:
+    ''' Handles compressed copies of the csv file, skipping unchanged content and pruning old copies
+
+    A backup is kept if it is among the last `keep_last` backups, or if it is the most recent backup of one of the last
+    `keep_hourly` hours or `keep_daily` days with backups.
+    '''
+
+    def __init__(self, folder=BACKUP_PATH, keep_last=BACKUP_KEEP_LAST, keep_hourly=BACKUP_KEEP_HOURLY,
+                 keep_daily=BACKUP_KEEP_DAILY):
+        self.folder = folder
+        self.keep_last = keep_last
+        self.keep_hourly = keep_hourly
+        self.keep_daily = keep_daily
+
+    def create_in_background(self, file_name):
+        ''' Create a backup of the file on a separate thread, which is awaited when the program exits '''
+
+        thread = threading.Thread(target=self.create, args=(file_name,))
+        thread.start()
+        return thread
+
+    def create(self, file_name):
+        ''' Create a gzip compressed backup of the file unless its content is already backed up, then prune '''
+
+        os.makedirs(self.folder, exist_ok=True)
+
+        with open(file_name, 'rb') as f:
+            # Identify content by its hash
+            content_hash = hash_content(f)
+
+            backup_name = None
+            if content_hash not in [backup_hash for _, _, backup_hash in self.list()]:
+                backup_name = "{}_{}{}.gz".format(datetime.now().strftime(BACKUP_TIME_FORMAT), content_hash, BACKUP_SUFFIX)
+
+                # Compress into a temporary file first to never leave a partial backup behind
+                f.seek(0)
+                temporary_path = os.path.join(self.folder, backup_name + '.tmp')
+                with gzip.open(temporary_path, 'wb') as backup:
+                    shutil.copyfileobj(f, backup)
+                os.replace(temporary_path, os.path.join(self.folder, backup_name))
+
+        self.prune()
+        return backup_name
+
+    def list(self):
+        ''' Returns backups ordered from oldest to newest, represented as (name, time, content hash) '''
+
+        if not os.path.isdir(self.folder):
+            return []
+
+        backups = []
+        for name in os.listdir(self.folder):
+            if not (name.endswith(BACKUP_SUFFIX) or name.endswith(BACKUP_SUFFIX + '.gz')):
+                continue
+
+            # Backups of earlier versions are uncompressed and named without content hash
+            parts = name[:name.index(BACKUP_SUFFIX)].split('_')
+            try:
+                backup_time = datetime.strptime(parts[0], BACKUP_TIME_FORMAT)
+            except ValueError:
+                continue
+            content_hash = parts[1] if len(parts) > 1 else None
+            backups.append((name, backup_time, content_hash))
+
+        return sorted(backups, key=lambda backup: (backup[1], backup[0]))
+
+    def prune(self):
+        ''' Delete backups that are not covered by the retention policy '''
+
+        backups = self.list()
+        newest_first = [(name, backup_time) for name, backup_time, _ in reversed(backups)]
+
+        keep = set(name for name, _ in newest_first[:self.keep_last])
+        for time_format, count in [('%Y%m%d%H', self.keep_hourly), ('%Y%m%d', self.keep_daily)]:
+            periods = set()
+            for name, backup_time in newest_first:
+                period = backup_time.strftime(time_format)
+                if period not in periods and len(periods) < count:
+                    periods.add(period)
+                    keep.add(name)
+
+        for name, _, _ in backups:
+            if name not in keep:
+                os.remove(os.path.join(self.folder, name))
+
+    def resolve(self, backup_name, file_name):
+        ''' Returns the name of a backup, where 'latest' refers to the most recent backup whose content differs from
+        the current content of the file '''
+
+        if backup_name != 'latest':
+            return backup_name
+
+        current_hash = None
+        if os.path.isfile(file_name):
+            with open(file_name, 'rb') as f:
+                current_hash = hash_content(f)
+        backups = [name for name, _, content_hash in self.list() if content_hash != current_hash]
+        if not backups:
+            raise FileNotFoundError('No backups in {} differing from {}'.format(self.folder, file_name))
+        return backups[-1]
+
+    def restore(self, backup_name, file_name):
+        ''' Replace the file by the content of a backup, where 'latest' refers to the most recent backup whose content
+        differs from the file '''
+
+        backup_name = self.resolve(backup_name, file_name)
+        backup_path = os.path.join(self.folder, backup_name)
+        temporary_name = file_name + '.tmp'
+        with (gzip.open if backup_name.endswith('.gz') else open)(backup_path, 'rb') as backup:
+            with open(temporary_name, 'wb') as f:
+                shutil.copyfileobj(backup, f)
+        os.replace(temporary_name, file_name)
+
+        return backup_name
+
+
+def hash_content(f):
+    ''' Returns the abbreviated SHA-256 hash identifying the content of a file opened in binary mode '''
+
+    digest = hashlib.sha256()
+    for block in iter(lambda: f.read(1024 * 1024), b''):
+        digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def get_backups(args):
+    ''' Returns backups handled according to the retention policy given as arguments '''
+
+    return Backups(keep_last=args.backup_keep_last, keep_hourly=args.backup_keep_hourly,
+                   keep_daily=args.backup_keep_daily)
+
+
+def open_datastore(file_name, **kwargs):
+    ''' Returns the datastore of the annotations in the given file, where folders ending with '.kpt' are binary stores
+    and files ending with '.sqlite' or '.db' are SQLite databases '''
+
+    if file_name.rstrip(os.sep).endswith(BINARY_STORE_SUFFIX):
+        return BinaryDatastore(file_name, **kwargs)
+    if file_name.endswith(SQLITE_SUFFIXES):
+        return SQLiteDatastore(file_name, **kwargs)
+    return Datastore(file_name, **kwargs)
+
+
+def convert_datastore(source, target):
+    ''' Replace the elements of the target datastore by the elements of the source datastore '''
+
+    annotations, statuses, _ = source.load()
+    target.save_annotations(source.get_filenames(), annotations, statuses)
+    return len(statuses)
+
+
+def parse_coordinates(rows):
+    ''' Returns coordinates of the rows as an array of shape (len(rows), NUM_BODY_PARTS, 2), parsing all "(x, y)" cells
+    at once instead of evaluating them one by one '''
+
+    import numpy as np
+
+    cells = ' '.join([' '.join(row[2:-1]) for row in rows]).translate(COORDINATE_TRANSLATION)
+    return np.fromstring(cells, dtype=np.float64, sep=' ').reshape(len(rows), NUM_BODY_PARTS, 2)
+
+
+def encode_coordinates(annotation):
+    ''' Returns coordinates of an annotation as float64 bytes '''
+
+    import numpy as np
+
+    return np.asarray(annotation, dtype=np.float64).reshape(NUM_BODY_PARTS, 2).tobytes()
+
+
+def decode_coordinates(blobs):
+    ''' Returns coordinates encoded as float64 bytes as an array of shape (len(blobs), NUM_BODY_PARTS, 2) '''
+
+    import numpy as np
+
+    return np.frombuffer(b''.join(blobs), dtype=np.float64).reshape(len(blobs), NUM_BODY_PARTS, 2).copy()
+
+
+def format_annotation(annotation):
+    ''' Returns coordinates of an annotation as "(x, y)" strings, leaving already formatted coordinates untouched '''
+
+    return [coordinate if isinstance(coordinate, str) else '({!r}, {!r})'.format(float(coordinate[0]), float(coordinate[1]))
+            for coordinate in annotation]
+
+
+class LeaseError(Exception):
+    ''' Raised when writing an image that is not leased from the shared pool '''
+
+
+class LeasePool:
+    ''' A pool of images shared by several annotators through a SQLite database on a shared filesystem
+
+    Annotators lease batches of images, renew their leases while working and mark images done when confirmed. Leases that
+    are not renewed expire and their images return to the pool.
+    '''
+
+    def __init__(self, file_name, owner, batch_size=LEASE_BATCH_SIZE, duration=LEASE_DURATION):
+        import sqlite3
+
+        self.file_name = file_name
+        self.owner = owner
+        self.batch_size = batch_size
+        self.duration = duration
+
+        # Transactions are handled explicitly, and wait for other annotators holding the lock
+        self.connection = sqlite3.connect(file_name, timeout=60, isolation_level=None)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS images (position INTEGER PRIMARY KEY, file TEXT UNIQUE, '
+                                "state TEXT NOT NULL DEFAULT 'open', owner TEXT, expires REAL)")
+        self.connection.execute('CREATE INDEX IF NOT EXISTS images_state ON images (state, position)')
+
+    def populate(self, filenames):
+        ''' Add images to the pool, ignoring images already in it, and returns the number of images added '''
+
+        with transaction(self.connection):
+            before = self.connection.total_changes
+            self.connection.executemany('INSERT OR IGNORE INTO images (file) VALUES (?)',
+                                        ((filename,) for filename in filenames))
+            return self.connection.total_changes - before
+
+    def lease(self):
+        ''' Lease a batch of open images, after returning expired leases to the pool, and returns their names '''
+
+        now = time.time()
+        with transaction(self.connection):
+            self.connection.execute("UPDATE images SET state = 'open', owner = NULL, expires = NULL "
+                                    "WHERE state = 'leased' AND expires < ?", (now,))
+            rows = self.connection.execute("SELECT position, file FROM images WHERE state = 'open' "
+                                           'ORDER BY position LIMIT ?', (self.batch_size,)).fetchall()
+            self.connection.executemany("UPDATE images SET state = 'leased', owner = ?, expires = ? WHERE position = ?",
+                                        [(self.owner, now + self.duration, position) for position, _ in rows])
+
+        return [filename for _, filename in rows]
+
+    def leased(self):
+        ''' Returns names of images currently leased, but not completed, by this annotator '''
+
+        rows = self.connection.execute("SELECT file FROM images WHERE state = 'leased' AND owner = ? AND expires >= ? "
+                                       'ORDER BY position', (self.owner, time.time())).fetchall()
+        return [filename for filename, in rows]
+
+    def renew(self):
+        ''' Extend all leases of this annotator '''
+
+        with transaction(self.connection):
+            self.connection.execute("UPDATE images SET expires = ? WHERE state = 'leased' AND owner = ?",
+                                    (time.time() + self.duration, self.owner))
+
+    def holds(self, filename):
+        ''' Returns True if the image is leased or completed by this annotator '''
+
+        row = self.connection.execute("SELECT 1 FROM images WHERE file = ? AND owner = ? AND "
+                                      "(state = 'done' OR expires >= ?)", (filename, self.owner, time.time())).fetchone()
+        return row is not None
+
+    def reclaim(self, filename):
+        ''' Lease an image again whose lease by this annotator expired, unless it was leased by another annotator since,
+        and returns True if it is leased '''
+
+        now = time.time()
+        with transaction(self.connection):
+            cursor = self.connection.execute("UPDATE images SET state = 'leased', owner = ?, expires = ? WHERE file = ? "
+                                             "AND (state = 'open' OR (state = 'leased' AND (owner = ? OR expires < ?)))",
+                                             (self.owner, now + self.duration, filename, self.owner, now))
+        return cursor.rowcount == 1
+
+    def complete(self, filename):
+        ''' Mark an image leased by this annotator as done '''
+
+        with transaction(self.connection):
+            self.connection.execute("UPDATE images SET state = 'done', expires = NULL WHERE file = ? AND owner = ?",
+                                    (filename, self.owner))
+
+    def release(self):
+        ''' Return images leased, but not completed, by this annotator to the pool '''
+
+        with transaction(self.connection):
+            self.connection.execute("UPDATE images SET state = 'open', owner = NULL, expires = NULL "
+                                    "WHERE state = 'leased' AND owner = ?", (self.owner,))
+
+    def counts(self):
+        ''' Returns number of images per state '''
+
+        return dict(self.connection.execute('SELECT state, COUNT(*) FROM images GROUP BY state').fetchall())
+
+    def close(self):
+        self.connection.close()
+
+
+@contextlib.contextmanager
+def transaction(connection):
+    ''' Hold the write lock of a SQLite database, committing on success and rolling back on errors '''
+
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
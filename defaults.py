@@ -0,0 +1,14 @@
+import os
+
+
+# Defaults of command line options, in a module without heavy imports such that the command line starts without
+# loading Pillow. Modules using them import them from here
+CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
+DISPLAY_CACHE_PATH = os.path.join(CURRENT_DIR, 'display_cache')
+PREFETCH_DISTANCE = 3
+IMAGE_CACHE_MB = 512
+RESAMPLE_PRESET_NAMES = ('fast', 'balanced', 'quality')
+PREDICT_WORKERS = 1
+PREDICT_BATCH_SIZE = 4
+HASH_METHODS = ('dhash', 'phash')
+DUPLICATE_DISTANCE = 4
@@ -0,0 +1,208 @@
+import os
+import re
+import json
+import random
+import hashlib
+
+
+CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
+MANIFEST_PATH = os.path.join(CURRENT_DIR, 'manifests')
+IMAGE_EXTENSIONS = ('.jpg', '.png')
+FRAME_NAME = re.compile(r'([^\[]*)\[(\d{4})')
+
+
+class ImageIndex:
+    ''' A read-only sequence of image names kept as a single encoded buffer instead of one string per image '''
+
+    def __init__(self, buffer, order=None):
+        # Import numpy only when images are listed, such that commands handling backups start faster
+        import numpy as np
+
+        # Names are newline terminated, only their end offsets and an optional reordering are stored
+        self.buffer = buffer
+        self.ends = np.flatnonzero(np.frombuffer(buffer, dtype=np.uint8) == ord('\n'))
+        self.order = order
+
+    @classmethod
+    def from_names(cls, names):
+        ''' Returns an index of the given names '''
+
+        return cls(''.join([name + '\n' for name in names]).encode('utf-8'))
+
+    def subset(self, positions):
+        ''' Returns an index of the names at the given positions, sharing the buffer of this index '''
+
+        import numpy as np
+
+        positions = np.asarray(positions, dtype=np.int64)
+        index = ImageIndex.__new__(ImageIndex)
+        index.buffer = self.buffer
+        index.ends = self.ends
+        index.order = positions if self.order is None else self.order[positions]
+        return index
+
+    def __len__(self):
+        return len(self.ends) if self.order is None else len(self.order)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('image index out of range')
+        if self.order is not None:
+            i = self.order[i]
+
+        start = self.ends[i - 1] + 1 if i > 0 else 0
+        return self.buffer[start:self.ends[i]].decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def get_image_names(dir_path, shuffle=False, training=False, extensions=IMAGE_EXTENSIONS, manifest_folder=MANIFEST_PATH,
+                    keyframe_interval=None):
+    ''' Returns ordered index of images in the folder and its subfolders, relative to the folder, only keyframes of
+        videos if a keyframe interval is given '''
+
+    if training or manifest_folder is None:
+        image_names = ImageIndex.from_names(sorted(scan_images(dir_path, extensions)))
+    else:
+        image_names = refresh_manifest(dir_path, extensions, manifest_folder)
+
+    if keyframe_interval:
+        image_names = image_names.subset(select_keyframes(image_names, keyframe_interval))
+
+    if shuffle:
+        # Deterministic shuffling to obtain randomized order of images
+        order = list(range(len(image_names)))
+        random.seed(42)
+        random.shuffle(order)
+        image_names = image_names.subset(order)
+
+    return image_names
+
+
+def parse_frame_name(name):
+    ''' Returns the video name and frame number of an image named as frame video[NNNN], or None for other images '''
+
+    match = FRAME_NAME.match(name)
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2))
+
+
+def select_keyframes(image_names, interval):
+    ''' Returns positions of images that are not video frames, and of every interval-th frame of each video counted from
+        its first frame, along with its last frame such that every frame lies between two keyframes '''
+
+    # First and last frame number of every video
+    frames = [parse_frame_name(name) for name in image_names]
+    first, last = {}, {}
+    for frame in frames:
+        if frame is not None:
+            video, number = frame
+            first[video] = min(first.get(video, number), number)
+            last[video] = max(last.get(video, number), number)
+
+    return [i for i, frame in enumerate(frames)
+            if frame is None or (frame[1] - first[frame[0]]) % interval == 0 or frame[1] == last[frame[0]]]
+
+
+def parse_extensions(value):
+    ''' Returns lowercase file extensions from a comma-separated list such as "jpg,.png" '''
+
+    return tuple('.' + extension.strip().lower().lstrip('.') for extension in value.split(',') if extension.strip())
+
+
+def scan_directory(dir_path, relative_dir, extensions):
+    ''' Returns images (relative to the image folder) and subdirectories of a single directory '''
+
+    names = []
+    subdirectories = []
+    with os.scandir(os.path.join(dir_path, relative_dir)) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                if not entry.name.startswith('.'):
+                    subdirectories.append(entry.name)
+            elif os.path.splitext(entry.name)[1].lower() in extensions:
+                names.append(os.path.join(relative_dir, entry.name) if relative_dir else entry.name)
+
+    return names, subdirectories
+
+
+def scan_images(dir_path, extensions):
+    ''' Returns unordered images of the folder and its subfolders, relative to the folder '''
+
+    image_names = []
+    directories = ['']
+    while directories:
+        relative_dir = directories.pop()
+        names, subdirectories = scan_directory(dir_path, relative_dir, extensions)
+        image_names.extend(names)
+        directories.extend(os.path.join(relative_dir, name) for name in subdirectories)
+
+    return image_names
+
+
+def refresh_manifest(dir_path, extensions, manifest_folder):
+    ''' Returns ordered index of images from a persisted manifest, rescanning only directories modified since '''
+
+    # A manifest consists of sorted image names and the modification time and subdirectories of every directory
+    key = hashlib.sha1('{}|{}'.format(os.path.abspath(dir_path), ','.join(sorted(extensions))).encode('utf-8')).hexdigest()
+    names_path = os.path.join(manifest_folder, key + '.names')
+    directories_path = os.path.join(manifest_folder, key + '.json')
+    try:
+        with open(directories_path, 'r') as f:
+            previous_directories = json.load(f)
+        with open(names_path, 'rb') as f:
+            buffer = f.read()
+    except (FileNotFoundError, ValueError):
+        previous_directories = {}
+        buffer = None
+
+    directories = {}
+    scanned = {}
+    pending = ['']
+    while pending:
+        relative_dir = pending.pop()
+
+        # Obtain modification time before scanning, such that changes during the scan are detected next time
+        mtime = os.stat(os.path.join(dir_path, relative_dir)).st_mtime_ns
+        record = previous_directories.get(relative_dir)
+        if buffer is None or record is None or record[0] != mtime:
+            names, subdirectories = scan_directory(dir_path, relative_dir, extensions)
+            scanned[relative_dir] = names
+            record = [mtime, subdirectories]
+
+        directories[relative_dir] = record
+        pending.extend(os.path.join(relative_dir, name) if relative_dir else name for name in record[1])
+
+    # Use the manifest as is if no directory changed
+    removed = set(previous_directories) - set(directories)
+    if buffer is not None and not scanned and not removed:
+        return ImageIndex(buffer)
+
+    # Keep images of unchanged directories and replace images of changed directories
+    names = []
+    if buffer is not None:
+        names = [name for name in ImageIndex(buffer)
+                 if os.path.dirname(name) not in scanned and os.path.dirname(name) not in removed]
+    for directory_names in scanned.values():
+        names.extend(directory_names)
+    names.sort()
+    image_names = ImageIndex.from_names(names)
+
+    # Write to temporary files first to never leave a partial manifest behind
+    os.makedirs(manifest_folder, exist_ok=True)
+    with open(names_path + '.tmp', 'wb') as f:
+        f.write(image_names.buffer)
+    with open(directories_path + '.tmp', 'w') as f:
+        json.dump(directories, f)
+    os.replace(names_path + '.tmp', names_path)
+    os.replace(directories_path + '.tmp', directories_path)
+
+    return image_names
@@ -0,0 +1,210 @@
+import os
+import hashlib
+import itertools
+import argparse
+import multiprocessing
+import numpy as np
+from PIL import Image
+
+from discovery import IMAGE_EXTENSIONS, ImageIndex, get_image_names, parse_extensions
+from images import decode_image
+from defaults import HASH_METHODS, DUPLICATE_DISTANCE
+
+
+CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
+HASH_CACHE_PATH = os.path.join(CURRENT_DIR, 'hashes')
+HASH_DECODE_SIZE = (64, 64)
+HASH_CHUNK_SIZE = 64
+HASH_BITS = 64
+MIN_HASH_BANDS = 3
+HASH_PAIR_CHUNK_SIZE = 65536
+
+# Number of set bits of every byte value
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+# Orthonormal DCT-II basis of 32 samples, of which the 8 lowest frequencies make up the pHash
+DCT_SIZE = 32
+DCT_BASIS = np.cos(np.pi * np.arange(DCT_SIZE)[:, None] * (2 * np.arange(DCT_SIZE)[None, :] + 1) / (2 * DCT_SIZE))
+
+
+def pack_bits(bits):
+    ''' Returns 64 booleans as an unsigned integer, the first being the most significant bit '''
+
+    return int(np.packbits(bits.ravel()).view('>u8')[0])
+
+
+def dhash(img):
+    ''' Returns the 64-bit difference hash of the image: whether each pixel of a 9x8 grayscale thumbnail is brighter than
+        its left neighbour '''
+
+    pixels = np.asarray(img.convert('L').resize((9, 8), Image.Resampling.BOX), dtype=np.int16)
+    return pack_bits(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(img):
+    ''' Returns the 64-bit perceptual hash of the image: whether each of the 8x8 lowest frequencies of the DCT of a 32x32
+        grayscale thumbnail is above their median, leaving out the mean '''
+
+    pixels = np.asarray(img.convert('L').resize((DCT_SIZE, DCT_SIZE), Image.Resampling.BOX), dtype=np.float64)
+    frequencies = (DCT_BASIS[:8] @ pixels @ DCT_BASIS[:8].T).ravel()
+    return pack_bits(frequencies > np.median(frequencies[1:]))
+
+
+def hash_image(path, method='dhash'):
+    ''' Returns the perceptual hash of the image file, decoded at reduced resolution '''
+
+    img = decode_image(path, HASH_DECODE_SIZE, resample='fast')
+    return dhash(img) if method == 'dhash' else phash(img)
+
+
+def hamming_distance(hashes, other_hashes):
+    ''' Returns the number of differing bits between arrays of 64-bit hashes '''
+
+    differences = np.bitwise_xor(np.asarray(hashes, dtype=np.uint64), np.asarray(other_hashes, dtype=np.uint64))
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(differences)
+    return POPCOUNT[differences.reshape(-1, 1).view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+
+def load_hashes(dir_path, image_names, method='dhash', workers=None, cache_folder=HASH_CACHE_PATH):
+    ''' Returns the perceptual hashes of the images as an array of unsigned 64-bit integers, hashing only images
+        modified since their hash was cached, in a pool of processes '''
+
+    # The cache holds the names, modification times and hashes of the images of a folder
+    key = hashlib.sha1('{}|{}'.format(os.path.abspath(dir_path), method).encode('utf-8')).hexdigest()
+    cache_path = os.path.join(cache_folder, key + '.npz')
+    cached = {}
+    try:
+        with np.load(cache_path) as cache:
+            cached = dict(zip(ImageIndex(cache['names'].tobytes()),
+                              zip(cache['mtimes'].tolist(), cache['hashes'].tolist())))
+    except (OSError, ValueError, KeyError):
+        pass
+
+    mtimes = np.array([os.stat(os.path.join(dir_path, name)).st_mtime_ns for name in image_names], dtype=np.int64)
+    hashes = np.zeros(len(mtimes), dtype=np.uint64)
+    missing = []
+    for i, (name, mtime) in enumerate(zip(image_names, mtimes.tolist())):
+        entry = cached.get(name)
+        if entry is not None and entry[0] == mtime:
+            hashes[i] = entry[1]
+        else:
+            missing.append(i)
+
+    if missing:
+        # Import process pools only when hashing. Processes are spawned rather than forked, since the GUI process runs
+        # decoding threads
+        from concurrent.futures import ProcessPoolExecutor
+
+        paths = [os.path.join(dir_path, image_names[i]) for i in missing]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            for i, value in zip(missing, executor.map(hash_image, paths, [method] * len(paths),
+                                                      chunksize=HASH_CHUNK_SIZE)):
+                hashes[i] = value
+
+        # Write to a temporary file first to never leave a partial cache behind
+        os.makedirs(cache_folder, exist_ok=True)
+        names = ImageIndex.from_names(list(image_names))
+        with open(cache_path + '.tmp', 'wb') as f:
+            np.savez(f, names=np.frombuffer(names.buffer, dtype=np.uint8), mtimes=mtimes, hashes=hashes)
+        os.replace(cache_path + '.tmp', cache_path)
+
+    return hashes
+
+
+def get_band_masks(width, max_bits):
+    ''' Returns all masks of a band of the given width with at most max_bits bits set '''
+
+    masks = [0]
+    for num_bits in range(1, max_bits + 1):
+        masks.extend(sum(1 << bit for bit in bits) for bits in itertools.combinations(range(width), num_bits))
+    return masks
+
+
+def find_close_pairs(unique, max_distance):
+    ''' Returns pairs (a, b) with a < b of the unique hashes differing in at most max_distance bits, by multi-index
+        hashing: the hashes are split into bands of which hashes within the distance differ in at most
+        max_distance // bands bits in at least one, and every hash is only compared with the hashes found by looking up
+        its band values with those bits flipped '''
+
+    # Bands as wide as the number of hashes needs for buckets to stay small, at most 22 bits for lookup tables to stay
+    # small as well
+    band_bits = max(1, int(np.ceil(np.log2(max(len(unique), 2)))))
+    num_bands = max(MIN_HASH_BANDS, min(max_distance + 1, HASH_BITS // band_bits))
+    bounds = np.linspace(0, HASH_BITS, num_bands + 1).astype(int)
+
+    pairs = []
+    for low, high in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        values = ((unique >> np.uint64(low)) & np.uint64((1 << (high - low)) - 1)).astype(np.int64)
+
+        # Hashes sorted by band value, with the start and size of every bucket of equal values
+        order = np.argsort(values, kind='stable')
+        counts = np.bincount(values, minlength=1 << (high - low))
+        starts = np.cumsum(counts) - counts
+
+        for mask in get_band_masks(high - low, max_distance // num_bands):
+            for chunk in range(0, len(unique), HASH_PAIR_CHUNK_SIZE):
+                a = np.arange(chunk, min(chunk + HASH_PAIR_CHUNK_SIZE, len(unique)))
+                probed = values[a] ^ mask
+                sizes = counts[probed]
+
+                # Every hash against all hashes of the bucket of its probed value
+                a = np.repeat(a, sizes)
+                offsets = np.arange(len(a)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+                b = order[np.repeat(starts[probed], sizes) + offsets]
+                keep = a < b
+                a, b = a[keep], b[keep]
+                close = hamming_distance(unique[a], unique[b]) <= max_distance
+                pairs.append(np.stack([a[close], b[close]], axis=1))
+
+    return np.concatenate(pairs) if pairs else np.empty((0, 2), dtype=np.int64)
+
+
+def find_duplicates(hashes, max_distance=DUPLICATE_DISTANCE):
+    ''' Returns for every image the position of the first image whose hash differs in at most max_distance bits, such
+        that images at their own position are originals and all others near-duplicates of an original before them '''
+
+    # Identical hashes are compared once
+    unique, first, inverse = np.unique(np.asarray(hashes, dtype=np.uint64), return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+
+    # Order every pair by the position of its images, visiting pairs in order of the earlier image
+    pairs = find_close_pairs(unique, max_distance)
+    pairs = np.where((first[pairs[:, 0]] < first[pairs[:, 1]])[:, None], pairs, pairs[:, ::-1])
+    pairs = pairs[np.argsort(first[pairs[:, 0]], kind='stable')]
+
+    # Assign every hash to the first original close to it
+    originals = np.arange(len(unique))
+    for a, b in pairs.tolist():
+        if originals[a] == a and originals[b] == b:
+            originals[b] = a
+
+    return first[originals[inverse]]
+
+
+def main(args):
+    ''' Hash all images of the image folder into the cache and report near-duplicates '''
+
+    image_names = get_image_names(args.image_folder, extensions=args.extensions)
+    hashes = load_hashes(args.image_folder, image_names, args.hash, args.workers, args.hash_cache)
+    originals = find_duplicates(hashes, args.distance)
+
+    duplicates = np.flatnonzero(originals != np.arange(len(originals)))
+    print("{} of {} images are near-duplicates of {} images".format(len(duplicates), len(originals),
+                                                                   len(np.unique(originals[duplicates]))))
+    for i in duplicates[:args.show].tolist():
+        print("  {} duplicates {}".format(image_names[i], image_names[int(originals[i])]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--image-folder', type=str, required=True, dest='image_folder', help='Path of folder with images to hash')
+    parser.add_argument('--extensions', type=parse_extensions, default=IMAGE_EXTENSIONS, help='Comma-separated file extensions of images, matched case-insensitively')
+    parser.add_argument('--hash', type=str, default='dhash', choices=HASH_METHODS, help='Perceptual hash of images')
+    parser.add_argument('--distance', type=int, default=DUPLICATE_DISTANCE, help='Largest number of differing bits of the hashes of near-duplicates')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of processes hashing images')
+    parser.add_argument('--hash-cache', type=str, default=HASH_CACHE_PATH, dest='hash_cache', help='Folder of cached hashes')
+    parser.add_argument('--show', type=int, default=20, help='Number of near-duplicates to list')
+    args = parser.parse_args()
+
+    main(args)
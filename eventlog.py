@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import timeit
+import argparse
+from collections import defaultdict
+
+from skeleton import BODY_PART_NAMES
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EVENT_LOG_PATH = os.path.join(BASE_DIR, 'events.log')
+IDLE_LIMIT = 300
+
+# Events are lines of tab-separated fields, starting with a code and the time in seconds since the epoch:
+# S time annotator              session started
+# I time image_index file       image shown
+# P time body_part seconds      body part placed, seconds since the image was shown or the previous body part placed
+# D time body_part              body part corrected by dragging its marker
+# C time image_index seconds    image confirmed, seconds since it was shown
+# R time image_index            previous image revisited
+SESSION, IMAGE, PLACED, DRAGGED, CONFIRMED, REVISITED = 'S', 'I', 'P', 'D', 'C', 'R'
+
+
+class EventLog:
+    ''' An append-only log of the time spent on every image and body part by an annotator '''
+
+    def __init__(self, path=EVENT_LOG_PATH, annotator=''):
+        self.file = open(path, 'a', buffering=1)
+        self.image_start = None
+        self.last_placed = None
+        self.write(SESSION, annotator)
+
+    def write(self, code, *fields):
+        self.file.write('\t'.join([code, '{:.3f}'.format(time.time())] + [str(field) for field in fields]) + '\n')
+
+    def image_shown(self, image_index, filename):
+        self.image_start = self.last_placed = timeit.default_timer()
+        self.write(IMAGE, image_index, filename)
+
+    def body_part_placed(self, body_part_index):
+        now = timeit.default_timer()
+        self.write(PLACED, body_part_index, '{:.3f}'.format(now - (self.last_placed or now)))
+        self.last_placed = now
+
+    def body_part_dragged(self, body_part_index):
+        self.write(DRAGGED, body_part_index)
+
+    def image_confirmed(self, image_index):
+        now = timeit.default_timer()
+        self.write(CONFIRMED, image_index, '{:.3f}'.format(now - (self.image_start or now)))
+
+    def image_revisited(self, image_index):
+        self.write(REVISITED, image_index)
+
+    def close(self):
+        self.file.close()
+
+
+def read_events(path):
+    ''' Yields events of a log as (annotator, code, time, fields), skipping lines that are incomplete '''
+
+    annotator = os.path.splitext(os.path.basename(path))[0]
+    with open(path, 'r') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 2 or not line.endswith('\n'):
+                continue
+            if fields[0] == SESSION:
+                annotator = fields[2] if len(fields) > 2 and fields[2] else annotator
+                continue
+            yield annotator, fields[0], float(fields[1]), fields[2:]
+
+
+def aggregate(paths, idle_limit=IDLE_LIMIT):
+    ''' Returns per-annotator throughput, per-body-part placement times and confirmed images with their dwell time,
+        counting at most idle_limit seconds per image or body part '''
+
+    # Import numpy only when aggregating, such that annotate.py imports the event log path without it
+    import numpy as np
+
+    confirmed = defaultdict(list)
+    placements = defaultdict(lambda: defaultdict(list))
+    drags = defaultdict(int)
+    revisits = defaultdict(int)
+    images = []
+    for path in paths:
+        shown = {}
+        for annotator, code, _, fields in read_events(path):
+            if code == IMAGE:
+                shown[annotator] = fields[1]
+            elif code == PLACED:
+                placements[annotator][int(fields[0])].append(min(float(fields[1]), idle_limit))
+            elif code == DRAGGED:
+                drags[annotator] += 1
+            elif code == REVISITED:
+                revisits[annotator] += 1
+            elif code == CONFIRMED:
+                seconds = min(float(fields[1]), idle_limit)
+                confirmed[annotator].append(seconds)
+                images.append((shown.get(annotator, fields[0]), annotator, seconds))
+
+    annotators = {}
+    for annotator in sorted(set(confirmed) | set(placements)):
+        dwell = np.array(confirmed[annotator], dtype=np.float64)
+        placed = [seconds for times in placements[annotator].values() for seconds in times]
+        num_images = len(dwell)
+        annotators[annotator] = {'images': num_images,
+                                 'hours': float(dwell.sum()) / 3600,
+                                 'images_per_hour': float(num_images * 3600 / dwell.sum()) if dwell.sum() else 0.0,
+                                 'seconds_per_image': float(np.median(dwell)) if num_images else 0.0,
+                                 'seconds_per_body_part': float(np.mean(placed)) if placed else 0.0,
+                                 'drags_per_image': drags[annotator] / num_images if num_images else 0.0,
+                                 'revisits': revisits[annotator]}
+
+    body_parts = {}
+    for body_part_index, body_part in enumerate(BODY_PART_NAMES):
+        times = np.array([seconds for annotator in placements for seconds in placements[annotator][body_part_index]])
+        if len(times):
+            body_parts[body_part] = {'placements': len(times), 'mean_seconds': float(times.mean()),
+                                     'median_seconds': float(np.median(times))}
+
+    return annotators, body_parts, sorted(images, key=lambda image: -image[2])
+
+
+def main(args):
+    ''' Aggregate annotation throughput over event logs of many annotators '''
+
+    annotators, body_parts, images = aggregate(args.logs, args.idle_limit)
+
+    print("{:<24}{:>8}{:>8}{:>12}{:>12}{:>12}{:>10}{:>10}".format(
+        'Annotator', 'Images', 'Hours', 'Images/h', 'Sec/image', 'Sec/part', 'Drags', 'Revisits'))
+    for annotator, stats in annotators.items():
+        print("{:<24}{:>8}{:>8.2f}{:>12.1f}{:>12.1f}{:>12.2f}{:>10.2f}{:>10}".format(
+            annotator[:23], stats['images'], stats['hours'], stats['images_per_hour'], stats['seconds_per_image'],
+            stats['seconds_per_body_part'], stats['drags_per_image'], stats['revisits']))
+
+    print("\n{:<16}{:>12}{:>12}{:>12}".format('Body part', 'Placements', 'Mean sec', 'Median sec'))
+    for body_part, stats in sorted(body_parts.items(), key=lambda item: -item[1]['mean_seconds']):
+        print("{:<16}{:>12}{:>12.2f}{:>12.2f}".format(
+            body_part, stats['placements'], stats['mean_seconds'], stats['median_seconds']))
+
+    print("\nSlowest images")
+    for filename, annotator, seconds in images[:args.slowest]:
+        print("{} ({}): {:.1f} s".format(filename, annotator, seconds))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'annotators': annotators, 'body_parts': body_parts,
+                       'slowest_images': [{'file': filename, 'annotator': annotator, 'seconds': seconds}
+                                          for filename, annotator, seconds in images[:args.slowest]]}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('logs', type=str, nargs='+', help='Paths of event logs written by annotate.py')
+    parser.add_argument('--idle-limit', type=float, default=IDLE_LIMIT, dest='idle_limit', help='Seconds counted at most per image or body part, such that breaks do not count as work')
+    parser.add_argument('--slowest', type=int, default=10, help='Number of slowest images to list')
+    parser.add_argument('--json', type=str, help='Path of json file to write the aggregates to')
+    args = parser.parse_args()
+
+    main(args)
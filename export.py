@@ -0,0 +1,154 @@
+import os
+import json
+import argparse
+import tempfile
+import zipfile
+import shutil
+import numpy as np
+
+from skeleton import BODY_PART_NAMES, BODY_PART_PARENT_INDEX, NUM_BODY_PARTS
+from datastore import open_datastore, CSV_PATH, LOAD_CHUNK_SIZE
+
+
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def get_coco_categories():
+    ''' Returns the COCO category of a person annotated with the body parts of this program '''
+
+    # Skeleton edges between body parts and their parents, numbered from 1
+    skeleton = [[i + 1, parent + 1] for i, parent in enumerate(BODY_PART_PARENT_INDEX) if parent != i]
+
+    return [{'id': 1, 'name': 'person', 'supercategory': 'person',
+             'keypoints': [body_part.lower().replace(' ', '_') for body_part in BODY_PART_NAMES],
+             'skeleton': skeleton}]
+
+
+def iter_selected(datastore, statuses, chunk_size):
+    ''' Yields chunks of file names and coordinates of the elements with one of the given statuses '''
+
+    for filenames, coordinates, chunk_statuses in datastore.iter_annotations(chunk_size):
+        selected = [i for i, status in enumerate(chunk_statuses) if status in statuses]
+        if selected:
+            yield [filenames[i] for i in selected], coordinates[selected]
+
+
+def export_coco(datastore, image_folder, output_path, statuses, chunk_size=LOAD_CHUNK_SIZE):
+    ''' Write annotations in COCO keypoint format, with pixel coordinates of the original images '''
+
+    # Only this format reads image files, so other formats are exported without loading Pillow
+    from images import get_upright_size
+
+    num_images = 0
+    with open(output_path, 'w') as f, tempfile.TemporaryFile('w+') as annotations_file:
+        f.write('{"info": {"description": "Keypoint annotations"}, ')
+        f.write('"categories": {}, '.format(json.dumps(get_coco_categories())))
+
+        # Images are written directly, annotations are buffered on disk and appended afterwards
+        f.write('"images": [')
+        for filenames, coordinates in iter_selected(datastore, statuses, chunk_size):
+            for filename, normalized_coordinates in zip(filenames, coordinates):
+                width, height = get_upright_size(os.path.join(image_folder, filename))
+                keypoints = normalized_coordinates * (width, height)
+
+                # Keypoints are (x, y, visibility), all body parts are labeled and considered visible
+                x_min, y_min = keypoints.min(axis=0)
+                x_max, y_max = keypoints.max(axis=0)
+                image_id = num_images + 1
+                image = {'id': image_id, 'file_name': filename, 'width': width, 'height': height}
+                annotation = {'id': image_id, 'image_id': image_id, 'category_id': 1, 'iscrowd': 0,
+                              'num_keypoints': NUM_BODY_PARTS,
+                              'keypoints': np.column_stack([keypoints, np.full(NUM_BODY_PARTS, 2)]).ravel().tolist(),
+                              'bbox': [float(x_min), float(y_min), float(x_max - x_min), float(y_max - y_min)],
+                              'area': float((x_max - x_min) * (y_max - y_min))}
+
+                separator = ', ' if num_images else ''
+                f.write(separator + json.dumps(image))
+                annotations_file.write(separator + json.dumps(annotation))
+                num_images += 1
+
+        f.write('], "annotations": [')
+        annotations_file.seek(0)
+        shutil.copyfileobj(annotations_file, f, COPY_BLOCK_SIZE)
+        f.write(']}\n')
+
+    return num_images
+
+
+def write_npy_member(zip_file, name, array_header, blocks):
+    ''' Write an array into a zip file as a .npy member from a header and a stream of blocks of raw bytes '''
+
+    with zip_file.open(name + '.npy', 'w', force_zip64=True) as f:
+        np.lib.format.write_array_header_2_0(f, array_header)
+        for block in blocks:
+            f.write(block)
+
+
+def read_blocks(f):
+    ''' Yields blocks of a file from its start '''
+
+    f.seek(0)
+    for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b''):
+        yield block
+
+
+def export_npz(datastore, output_path, statuses, chunk_size=LOAD_CHUNK_SIZE):
+    ''' Write normalized coordinates of shape (N, NUM_BODY_PARTS, 2) and file names to a compressed .npz file '''
+
+    # Buffer arrays on disk, since their lengths are needed before writing the .npy headers
+    num_images = 0
+    name_length = 1
+    with tempfile.TemporaryFile() as keypoints_file, tempfile.TemporaryFile('w+') as names_file:
+        for filenames, coordinates in iter_selected(datastore, statuses, chunk_size):
+            keypoints_file.write(coordinates.astype(np.float32).tobytes())
+            names_file.write(''.join([filename + '\n' for filename in filenames]))
+            name_length = max([name_length] + [len(filename) for filename in filenames])
+            num_images += len(filenames)
+
+        def name_blocks():
+            names_file.seek(0)
+            while True:
+                filenames = [names_file.readline().rstrip('\n') for _ in range(chunk_size)]
+                filenames = filenames[:filenames.index('')] if '' in filenames else filenames
+                if not filenames:
+                    break
+                yield np.array(filenames, dtype='<U{}'.format(name_length)).tobytes()
+
+        with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_DEFLATED) as zip_file:
+            write_npy_member(zip_file, 'keypoints',
+                             {'descr': '<f4', 'fortran_order': False, 'shape': (num_images, NUM_BODY_PARTS, 2)},
+                             read_blocks(keypoints_file))
+            write_npy_member(zip_file, 'files',
+                             {'descr': '<U{}'.format(name_length), 'fortran_order': False, 'shape': (num_images,)},
+                             name_blocks())
+
+    return num_images
+
+
+def main(args):
+    ''' Export annotations for training pipelines '''
+
+    datastore = open_datastore(args.annotations, read_only=True)
+    statuses = set(args.statuses.split(','))
+
+    if args.coco:
+        if not args.image_folder:
+            raise SystemExit('--image-folder is required to export pixel coordinates in COCO format')
+        num_images = export_coco(datastore, args.image_folder, args.coco, statuses)
+        print("Exported {} images to {}".format(num_images, args.coco))
+
+    if args.npz:
+        num_images = export_npz(datastore, args.npz, statuses)
+        print("Exported {} images to {}".format(num_images, args.npz))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--annotations', type=str, default=CSV_PATH, help="Path of annotations to export, a csv file, a folder ending with '.kpt' or a SQLite database")
+    parser.add_argument('--image-folder', type=str, dest='image_folder', help='Path of folder with the annotated images')
+    parser.add_argument('--coco', type=str, help='Path of COCO keypoint json file to write')
+    parser.add_argument('--npz', type=str, help='Path of .npz file to write with arrays "keypoints" and "files"')
+    parser.add_argument('--statuses', type=str, default='True', help='Comma-separated statuses of images to export')
+    args = parser.parse_args()
+
+    main(args)
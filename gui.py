@@ -0,0 +1,1260 @@
+import copy
+import os
+import sys
+import timeit
+from datetime import datetime
+import tkinter as tk
+from tkinter import font, messagebox
+import numpy as np
+from PIL import ImageTk, Image
+
+from skeleton import BODY_PART_NAMES, BODY_PART_PARENT_INDEX, BODY_PART_CHILD_INDICES, BODY_PART_COLORS, NUM_BODY_PARTS
+from datastore import (Datastore, LeasePool, LeaseError, open_datastore, get_backups, DRAFT_STATUS,
+                       INTERPOLATED_STATUS, DUPLICATE_STATUS)
+from images import ImageCache, DisplayCache, get_resized_size, get_image_area, load_guideline_images
+from discovery import ImageIndex, get_image_names, parse_frame_name
+from score import TRAINING_MARGIN
+from metrics import Metrics
+from eventlog import EventLog
+from predict import PreAnnotator
+from track import FrameTracker
+from duplicates import load_hashes, find_duplicates
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRAINING_DIR = os.path.join(BASE_DIR, 'training')
+SESSIONS_PATH = os.path.join(BASE_DIR, "sessions.txt")
+LEASE_RENEW_INTERVAL = 60
+DRAFT_POLL_INTERVAL = 50
+DRAFT_OUTLINE = '#ffd400'
+METRICS_INTERVAL = 60
+TIMED_METHODS = ('load_image', 'save_to_datastore', 'update_image', 'update_image_text', 'draw_markers', 'next_image',
+                 'previous_image', 'on_image_release', 'on_marker_click', 'on_marker_motion', 'render_drag',
+                 'on_marker_release', 'on_confirm_click', 'on_right_click', 'apply_draft')
+TIMED_DATASTORE_METHODS = ('load', 'get_annotations', 'get_statuses', 'get_filenames', 'get_last_thumbnail_index',
+                           'save_annotation', 'compact')
+
+
+class CanvasLayer:
+    ''' Named canvas items and fonts that are created once and then updated in place, such that the number of Tk
+        objects stays constant however often the display changes '''
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.items = {}
+        self.fonts = {}
+
+    def font(self, size, weight='bold', family='Helvetica'):
+        ''' Returns a named font, created on first use '''
+
+        key = (family, size, weight)
+        if key not in self.fonts:
+            self.fonts[key] = font.Font(root=self.canvas, family=family, size=size, weight=weight)
+        return self.fonts[key]
+
+    def item(self, name, kind, coordinates, **options):
+        ''' Show the item of the given name at the coordinates with the options on top of all other items, creating it on
+            first use '''
+
+        item = self.items.get(name)
+        if item is None:
+            item = getattr(self.canvas, 'create_' + kind)(*coordinates, **options)
+            self.items[name] = item
+        else:
+            # Raise reused items, as created items are, since items shown since may be stacked above them
+            self.canvas.coords(item, *coordinates)
+            self.canvas.itemconfigure(item, state=tk.NORMAL, **options)
+            self.canvas.tag_raise(item)
+        return item
+
+    def text(self, name, x, y, **options):
+        return self.item(name, 'text', (x, y), **options)
+
+    def image(self, name, x, y, **options):
+        return self.item(name, 'image', (x, y), **options)
+
+    def rectangle(self, name, x0, y0, x1, y1, **options):
+        return self.item(name, 'rectangle', (x0, y0, x1, y1), **options)
+
+    def window(self, name, x, y, **options):
+        return self.item(name, 'window', (x, y), **options)
+
+    def hide(self, *names):
+        ''' Hide items without deleting them '''
+
+        for name in names:
+            if name in self.items:
+                self.canvas.itemconfigure(self.items[name], state=tk.HIDDEN)
+
+    def object_counts(self):
+        ''' Returns the number of canvas items, named fonts and images of the Tk interpreter '''
+
+        return {'canvas_items': len(self.canvas.find_all()), 'fonts': len(font.names(self.canvas)),
+                'images': len(self.canvas.image_names())}
+
+
+class Annotate(tk.Frame):
+    ''' Initialize parameters and GUI '''
+
+    def __init__(self, root, args, training=False):
+        super().__init__()
+        root.attributes('-fullscreen', True)
+        self.root = root
+        self.args = args
+
+        # GUI dimensions
+        screen_width, screen_height = root.winfo_screenwidth(), self.root.winfo_screenheight()
+        self.toolbar_height = int(screen_height * 0.15)
+        self.image_size = get_image_area((screen_width, screen_height))
+        self.guideline_height = self.toolbar_height - 16
+        self.image_cache = ImageCache(self.image_size, max_bytes=args.image_cache_mb * 1024 * 1024,
+                                      resample=args.resample,
+                                      display_cache=DisplayCache(self.image_size, args.display_cache, args.resample))
+        self.marker_radius = int((screen_height / 60) * 0.65)
+        self.line_width = int((screen_height / 150) * 0.65)
+
+        # Initialize
+        self.root = root
+        self.lease_pool = None
+        if self.args.pool and not training:
+            self.lease_pool = LeasePool(self.args.pool, self.args.annotator, batch_size=self.args.lease_batch_size)
+        self.datastore = open_datastore(self.args.annotations, training=training, backups=get_backups(args),
+                                        lease_pool=self.lease_pool)
+
+        # Time hot paths only when enabled, such that methods are left untouched otherwise. Metrics are kept when the
+        # program is initialized again after training
+        self.metrics = getattr(self, 'metrics', None)
+        if self.args.metrics:
+            self.metrics = self.metrics or Metrics(self.args.metrics_folder)
+            self.metrics.instrument(self, TIMED_METHODS)
+            self.metrics.add_counters('image_cache', self.image_cache.stats)
+            self.time_datastore(self.datastore)
+        self.body_part_index = 0
+        self.thumbnails_path = self.args.image_folder
+        self.thumbnail_index = 0
+        if self.lease_pool is not None:
+            self.thumbnails = self.get_leased_image_names()
+        elif self.args.keyframe_interval and not training:
+            self.thumbnails = self.get_keyframe_names()
+        else:
+            self.thumbnails = get_image_names(self.thumbnails_path, extensions=self.args.extensions)
+        self.current_coordinates = []
+        self.markers = []
+        self.marker_body_parts = {}
+        self.lines = []
+        self.annotations = []
+        self.absent_body_parts = set()
+        self.completed_objects = []
+        self.statuses = []
+        self.tk_image = None
+        self.prize_image = None
+        self.continue_button = None
+
+        # Predict keypoints of upcoming images in the background while annotating, not while training
+        self.pre_annotator = None
+        self.draft_poll = None
+        self.draft_errors = set()
+        if self.args.predictor and not training:
+            self.pre_annotator = PreAnnotator(self.args.predictor, workers=self.args.predictor_workers,
+                                              batch_size=self.args.predictor_batch_size)
+
+        # Track keypoints of confirmed video frames into the next frame while annotating
+        self.tracker = None
+        if self.args.track and not training:
+            self.tracker = FrameTracker(self.image_cache)
+
+        # Position of the image every image is a near-duplicate of, not while training or leasing images since the
+        # images to annotate are not known in advance
+        self.duplicates = None
+        if self.args.duplicates and not training and self.lease_pool is None:
+            self.duplicates = find_duplicates(load_hashes(self.thumbnails_path, self.thumbnails, self.args.hash,
+                                                          self.args.workers), self.args.duplicate_distance)
+
+        # Log time spent per image and body part while annotating, not while training
+        self.event_log = None
+        if self.args.event_log and not training:
+            self.event_log = EventLog(self.args.event_log, self.args.annotator)
+
+        # Load annotations, thumbnail index and statuses
+        self.load_from_datastore()
+
+        # Load number of image started at and time of start
+        self.start_image = self.thumbnail_index - 1
+        self.start_time = timeit.default_timer()
+
+        # Create dictionary to track body part markers
+        self._drag_data = {"x": 0, "y": 0, "item": None}
+
+        # Motion events are coalesced into one canvas update per idle tick, with the latency of each update recorded
+        # when metrics are enabled
+        self.drag_pointer = None
+        self.drag_render = None
+        self.drag_pending_since = 0.0
+
+        # Flags
+        self.is_dragging = False
+        self.training_done = False
+        self.is_training = False
+
+        # Initialize GUI
+        self.initialize_gui()
+
+        # Figure out if annotation work is already done
+        completed = False
+        if self.is_completed():
+            completed = True
+            self.thumbnail_index -= 1
+
+        # Display body part markers
+        self.update_image()
+
+        # Display completion screen
+        if completed:
+            self.show_completed_screen()
+
+        # Keep leases of the shared pool alive while working
+        if self.lease_pool is not None:
+            self.root.after(LEASE_RENEW_INTERVAL * 1000, self.renew_leases)
+
+        # Export metrics periodically
+        if self.metrics is not None:
+            self.root.after(METRICS_INTERVAL * 1000, self.export_metrics)
+
+    def time_datastore(self, datastore):
+        ''' Record latency of reads and writes of a datastore if metrics are enabled '''
+
+        if self.metrics is not None:
+            self.metrics.instrument(datastore, TIMED_DATASTORE_METHODS, prefix='datastore.')
+
+    def export_metrics(self):
+        ''' Write metrics for scraping and schedule the next export '''
+
+        self.metrics.write_prometheus()
+        self.root.after(METRICS_INTERVAL * 1000, self.export_metrics)
+
+    def initialize_gui(self):
+        ''' Display visual elements '''
+        self.add_main_frame(self.root)
+        self.bind_keystroke_events(self.root)
+        self.add_top_canvas()
+        self.add_bottom_canvas()
+        self.add_annotation_frame()
+        self.add_guideline()
+        self.add_last_image_button()
+        self.add_confirm_button()
+        self.initialize_lines()
+        self.initialize_markers()
+
+    def load_from_datastore(self):
+        ''' Extract information from datastore '''
+
+        # Obtain annotations, statuses and index of current image in a single pass
+        annotations, statuses, last_index = self.datastore.load()
+        if last_index > -1:
+            self.thumbnail_index = last_index + 1
+
+        # Keep annotations as views into the loaded array
+        self.annotations.extend(annotations)
+        self.statuses.extend(statuses)
+
+        # Continue after images not annotated by hand
+        self.skip_images()
+
+    def get_leased_image_names(self):
+        ''' Returns images already annotated by this annotator followed by images leased from the shared pool '''
+
+        image_names = self.datastore.get_filenames()
+        annotated = set(image_names)
+        image_names.extend(name for name in self.lease_pool.leased() if name not in annotated)
+
+        # Lease a new batch unless there are leased images left to annotate
+        if len(image_names) == len(annotated):
+            image_names.extend(self.lease_pool.lease())
+
+        return ImageIndex.from_names(image_names)
+
+    def get_keyframe_names(self):
+        ''' Returns images already in the datastore followed by the keyframes of videos not annotated yet '''
+
+        image_names = self.datastore.get_filenames()
+        annotated = set(image_names)
+        image_names.extend(name for name in get_image_names(self.thumbnails_path, extensions=self.args.extensions,
+                                                            keyframe_interval=self.args.keyframe_interval)
+                           if name not in annotated)
+
+        return ImageIndex.from_names(image_names)
+
+    def lease_images(self):
+        ''' Extend the images to annotate by a batch leased from the shared pool '''
+
+        image_names = self.lease_pool.lease()
+        if image_names:
+            self.thumbnails = ImageIndex.from_names(list(self.thumbnails) + image_names)
+
+    def renew_leases(self):
+        ''' Periodically extend leases of the shared pool '''
+
+        self.lease_pool.renew()
+        self.root.after(LEASE_RENEW_INTERVAL * 1000, self.renew_leases)
+
+    def current_video_name(self):
+        ''' Returns current video name '''
+
+        # Extract name of current video
+        return parse_frame_name(self.thumbnails[self.thumbnail_index])[0]
+
+    def current_image_number(self):
+        ''' Returns current image number '''
+
+        # Extract number of current image
+        return parse_frame_name(self.thumbnails[self.thumbnail_index])[1]
+
+    def is_next_frame(self, index):
+        ''' Returns True if the image is the frame following the previous image in the same video '''
+
+        if index == 0:
+            return False
+        frame, previous_frame = parse_frame_name(self.thumbnails[index]), parse_frame_name(self.thumbnails[index - 1])
+        return frame is not None and previous_frame is not None and frame[0] == previous_frame[0] and \
+            frame[1] == previous_frame[1] + 1
+
+    def initialize_markers(self):
+        ''' Initializes body part markers '''
+
+        for body_part_index in range(NUM_BODY_PARTS):
+
+            # Create markers and map canvas items back to body parts
+            marker = self.top_canvas.create_oval(
+                0, 0, 0, 0, fill="", outline="")
+            self.markers.append(marker)
+            self.marker_body_parts[marker] = body_part_index
+            self.current_coordinates.append((0, 0))
+
+            # Bind to events
+            self.top_canvas.tag_bind(
+                marker, "<ButtonPress-1>", self.on_marker_click)
+            self.top_canvas.tag_bind(
+                marker, "<ButtonRelease-1>", self.on_marker_release)
+            self.top_canvas.tag_bind(
+                marker, "<B1-Motion>", self.on_marker_motion)
+
+    def initialize_lines(self):
+        ''' Initializes body part association lines '''
+
+        for _ in range(NUM_BODY_PARTS):
+
+            # Create lines
+            line = self.top_canvas.create_line(300, 35, 400, 200, fill='', width=self.line_width)
+            self.lines.append(line)
+
+    def reset_markers(self):
+        ''' Reset body part markers due to change of image '''
+
+        # Reset body part index
+        self.body_part_index = 0
+
+        # Reset body part markers
+        for i in range(NUM_BODY_PARTS):
+            marker = self.markers[i]
+            self.top_canvas.itemconfig(marker, fill='', outline='', width=1)
+            self.top_canvas.coords(marker, 0, 0, 0, 0)
+
+    def reset_lines(self):
+        ''' Reset body part association lines due to change of image '''
+
+        # Reset body part association lines
+        for i in range(NUM_BODY_PARTS):
+            line = self.lines[i]
+            self.top_canvas.itemconfig(line, fill='', width=1)
+
+    def draw_markers(self):
+        ''' Draw markers of a image previously annotated '''
+
+        # Set body part index to maximum value
+        self.body_part_index = NUM_BODY_PARTS
+
+        # Coordinates do not exist
+        if self.thumbnail_index >= len(self.annotations):
+            raise RuntimeWarning(
+                'Trying to draw markers, but has no coordinates')
+
+        # Outline markers of drafts until they are confirmed
+        outline = DRAFT_OUTLINE if self.statuses[self.thumbnail_index] == DRAFT_STATUS else 'white'
+
+        for body_part_index in range(NUM_BODY_PARTS):
+
+            # Obtain parent index
+            parent_index = BODY_PART_PARENT_INDEX[body_part_index]
+
+            # Draw marker
+            marker = self.markers[body_part_index]
+            self.top_canvas.itemconfig(
+                marker, fill=BODY_PART_COLORS[body_part_index], outline=outline)
+
+            # Draw association line
+            line = self.lines[body_part_index]
+            self.top_canvas.itemconfig(
+                line, fill=BODY_PART_COLORS[parent_index], width=self.line_width)
+
+            # Fetch location of marker and parent marker
+            normalized_x, normalized_y = self.current_coordinates[body_part_index]
+            x_pos = normalized_x * self.image.width
+            y_pos = normalized_y * self.image.height
+            normalized_x_parent, normalized_y_parent = self.current_coordinates[parent_index]
+            x_pos_parent = normalized_x_parent * self.image.width
+            y_pos_parent = normalized_y_parent * self.image.height
+
+            # Set location of marker
+            self.top_canvas.coords(
+                marker, x_pos - self.marker_radius, y_pos - self.marker_radius, x_pos + self.marker_radius, y_pos + self.marker_radius)
+            
+            # Set location of association line
+            self.top_canvas.coords(
+                line, x_pos, y_pos, x_pos_parent, y_pos_parent)
+
+    def bind_keystroke_events(self, root):
+        ''' Facilitate keystroke events '''
+
+        root.bind('<Left>', self.previous_image)
+        root.bind('<BackSpace>', self.previous_image)
+        root.bind('<Right>', self.on_confirm_click)
+        root.bind('<Return>', self.on_confirm_click)
+        root.bind('<space>', self.on_confirm_click)
+        root.bind('<Escape>', self.close)
+        root.bind('e', self.quit_training)
+
+    def add_main_frame(self, root):
+        self.main_frame = tk.Frame(root)
+        self.main_frame.pack(side=tk.LEFT, fill=tk.BOTH,
+                             expand=True, padx=0, pady=0)
+
+    def add_top_canvas(self):
+        self.top_canvas = tk.Canvas(self.main_frame)
+        self.top_canvas.pack(side='top', fill=tk.NONE)
+        self.top_canvas.configure(background='black')
+        self.layer = CanvasLayer(self.top_canvas)
+
+    def add_bottom_canvas(self):
+        self.bottom_canvas = tk.Canvas(
+            self.main_frame)
+
+        self.bottom_canvas.pack_propagate(0)
+        self.bottom_canvas.pack(side='bottom', fill=tk.Y)
+
+    def get_resized_size(self, img):
+        ''' Returns size of image in fullscreen mode '''
+
+        return get_resized_size(img.size, self.image_size)
+
+    def load_image(self, imagepath):
+        img = self.image_cache.get(imagepath)
+        self.image = img
+
+        # Reuse the Tk image when the size is unchanged
+        if self.tk_image is not None and (self.tk_image.width(), self.tk_image.height()) == img.size:
+            self.tk_image.paste(img)
+        else:
+            self.tk_image = ImageTk.PhotoImage(img, size=img.size)
+
+    def prefetch_images(self):
+        ''' Decode images surrounding the current image in the background '''
+
+        distance = self.args.prefetch
+        indices = [self.thumbnail_index + offset for offset in range(1, distance + 1)] + \
+                  [self.thumbnail_index - offset for offset in range(1, distance + 1)]
+        self.image_cache.prefetch([os.path.join(self.thumbnails_path, self.thumbnails[i])
+                                   for i in indices if 0 <= i < len(self.thumbnails)])
+
+        # Track keypoints of the previous frame, once confirmed, into the current frame of the same video
+        if self.tracker is not None and self.is_new_image() and self.is_next_frame(self.thumbnail_index) and \
+                self.statuses[self.thumbnail_index - 1] == 'True':
+            self.tracker.track(os.path.join(self.thumbnails_path, self.thumbnails[self.thumbnail_index]),
+                               os.path.join(self.thumbnails_path, self.thumbnails[self.thumbnail_index - 1]),
+                               self.annotations[self.thumbnail_index - 1])
+
+        # Predict keypoints of the current and next images not annotated yet
+        if self.pre_annotator is not None:
+            self.pre_annotator.prefetch([os.path.join(self.thumbnails_path, self.thumbnails[i])
+                                         for i in range(max(self.thumbnail_index, len(self.annotations)),
+                                                        min(self.thumbnail_index + distance + 1, len(self.thumbnails)))])
+
+    def apply_draft(self):
+        ''' Pre-fill markers of a new image with keypoints tracked or predicted in the background, once they are
+            available '''
+
+        # Only images without annotations and without markers placed are pre-filled
+        if (self.tracker is None and self.pre_annotator is None and self.duplicates is None) or not self.is_new_image() \
+                or self.is_completed() or self.body_part_index > 0:
+            return
+
+        # Prefer keypoints of a confirmed near-duplicate, then keypoints tracked from the previous frame to predicted
+        # keypoints, checking again shortly while either is running
+        filename = self.thumbnails[self.thumbnail_index]
+        path = os.path.join(self.thumbnails_path, filename)
+        draft = None
+        original = self.get_original(self.thumbnail_index)
+        if original is not None:
+            draft = np.asarray(self.annotations[original], dtype=np.float64)
+        if draft is None and self.tracker is not None:
+            if self.tracker.pending(path):
+                self.draft_poll = self.root.after(DRAFT_POLL_INTERVAL, self.apply_draft)
+                return
+            try:
+                draft = self.tracker.get(path)
+            except Exception as error:
+                self.report_draft_error('Tracking', filename, error)
+        if draft is None and self.pre_annotator is not None:
+            try:
+                draft = self.pre_annotator.get(path)
+            except Exception as error:
+                self.report_draft_error('Prediction', filename, error)
+            if draft is None and self.pre_annotator.pending(path):
+                self.draft_poll = self.root.after(DRAFT_POLL_INTERVAL, self.apply_draft)
+                return
+        if draft is None:
+            return
+
+        # Store the draft with its own status, such that it is never taken for a confirmed annotation. Drafts of images
+        # leased from a shared pool are only kept in memory, since the images return to the pool unless confirmed. Only
+        # the last image can hold an unconfirmed draft, such that stored positions stay contiguous
+        self.annotations.append([tuple(coordinates) for coordinates in draft.tolist()])
+        self.statuses.append(DRAFT_STATUS)
+        if self.lease_pool is None:
+            self.datastore.save_annotation(index=self.thumbnail_index, filename=filename,
+                                           annotation=self.annotations[self.thumbnail_index], status=DRAFT_STATUS)
+
+        # Show the draft ready for correction
+        self.current_coordinates = self.annotations[self.thumbnail_index]
+        self.draw_markers()
+        self.update_image_text()
+        self.add_guideline_image(self.body_part_index)
+
+    def add_annotation_frame(self):
+        self.annotation_frame = self.top_canvas.create_image(
+            0, 0, anchor='nw',
+        )
+
+        # Facilitate click to place markers
+        self.top_canvas.bind("<ButtonRelease-1>", self.on_image_release)
+
+        # Facilitate right click to confirm annotation
+        self.top_canvas.bind('<Button-2>', self.on_right_click)
+        self.top_canvas.bind('<Button-3>', self.on_right_click)
+
+    def add_last_image_button(self):
+        self.last_image_button = tk.Button(
+            self.bottom_canvas, width=10, text="LAST\nIMAGE", bg="white", fg="black", borderwidth=0, default='active', command=self.previous_image)
+        self.last_image_button.config(font=('helvetica', 14, 'bold'))
+        self.last_image_button.pack(fill=tk.Y, side=tk.LEFT)
+
+    def add_confirm_button(self):
+        self.accept_button = tk.Button(
+            self.bottom_canvas, text="CONFIRM\nANNOTATION", bg="white", fg="green", borderwidth=0, default='active', command=self.on_confirm_click)
+        self.accept_button.config(font=('helvetica', 14, 'bold'))
+        self.accept_button.pack(fill=tk.BOTH, side=tk.LEFT, expand=True)
+
+    def add_guideline(self):
+        self.add_guideline_atlas()
+        self.add_guideline_area()
+        self.add_guideline_label()
+        self.add_guideline_image(0)
+
+    def add_guideline_atlas(self):
+        ''' Decode and scale all guideline images once, such that changing guideline only swaps a reference '''
+
+        self.guideline_atlas = [ImageTk.PhotoImage(img)
+                                for img in load_guideline_images(self.guideline_height - 10)]
+
+    def add_guideline_area(self):
+        self.guideline_canvas = tk.Frame(
+            self.bottom_canvas, height=self.toolbar_height)
+        self.guideline_canvas.pack(fill=tk.BOTH, side=tk.LEFT)
+
+    def add_guideline_label(self):
+        self.guideline_label = tk.Label(
+            self.guideline_canvas, text="GUIDELINE:", width=12)
+        self.guideline_label.config(font=('helvetica', 10, 'bold'))
+        self.guideline_label.pack(side=tk.TOP, fill=tk.Y)
+
+    def add_guideline_image(self, body_part_index):
+
+        # Swap to precomputed image
+        self.guideline_image = self.guideline_atlas[body_part_index]
+
+        try:
+            if self.guideline_field:
+                if self.guideline_field.image is not self.guideline_image:
+                    self.guideline_field.configure(image=self.guideline_image)
+                    self.guideline_field.image = self.guideline_image
+        except:
+            self.guideline_field = tk.Label(
+                self.guideline_canvas, image=self.guideline_image)
+            self.guideline_field.image = self.guideline_image
+            self.guideline_field.pack(fill=tk.BOTH, side=tk.BOTTOM)
+
+    #
+    #  EVENTS
+    #
+
+    def close(self, event):
+        '''Exit the program'''
+
+        # Store number of images annotated and time spent
+        store_session(self)
+
+        # Merge journaled annotations into the csv file
+        self.datastore.compact()
+
+        # Stop prefetching images, predicting and tracking keypoints
+        self.image_cache.close()
+        if self.pre_annotator is not None:
+            self.pre_annotator.close()
+        if self.tracker is not None:
+            self.tracker.close()
+
+        # Return images not annotated to the shared pool
+        if self.lease_pool is not None:
+            self.lease_pool.release()
+
+        # Close the event log
+        if self.event_log is not None:
+            self.event_log.close()
+
+        # Write final metrics
+        if self.metrics is not None:
+            self.metrics.write_prometheus()
+            self.metrics.write_summary()
+
+        # Exit
+        sys.exit()
+
+    def quit_training(self, event):
+        '''Shortcut to quit training'''
+
+        # Continue to annotation program
+        if self.is_training:
+            self.on_complete_training(self.args)
+
+    def on_confirm_click(self, event=None):
+        ''' Act if confirm button is pressed '''
+
+        if self.body_part_index == NUM_BODY_PARTS:
+
+            # Keep a copy of the stored state of the image, to return to if it can no longer be saved
+            previous = None
+            if not self.is_new_image():
+                previous = (copy.deepcopy(self.annotations[self.thumbnail_index]), self.statuses[self.thumbnail_index])
+
+            # Store coordinates
+            if self.is_new_image():
+                if not len(self.annotations) == len(self.thumbnails):
+                    self.annotations.append(
+                        copy.deepcopy(self.current_coordinates))
+                    self.statuses.append('True')
+            else:
+                self.annotations[self.thumbnail_index] = copy.deepcopy(
+                    self.current_coordinates)
+                self.statuses[self.thumbnail_index] = 'True'
+            if self.thumbnail_index < len(self.annotations):
+                try:
+                    self.save_to_datastore()
+                except LeaseError:
+                    self.drop_lost_image(previous)
+                    return
+            if self.event_log is not None:
+                self.event_log.image_confirmed(self.thumbnail_index)
+
+            # Change to next image
+            self.next_image()
+
+    def drop_lost_image(self, previous):
+        ''' Undo the confirmation of an image leased by another annotator after its lease expired, and remove it from
+        the images to annotate unless it was stored before '''
+
+        filename = self.thumbnails[self.thumbnail_index]
+        if previous is None or (previous[1] == DRAFT_STATUS and self.thumbnail_index == len(self.annotations) - 1):
+            # Images after a new image, or an image with a draft kept in memory, are not stored yet, such that removing
+            # it keeps positions in the datastore
+            self.annotations.pop()
+            self.statuses.pop()
+            image_names = list(self.thumbnails)
+            del image_names[self.thumbnail_index]
+            self.thumbnails = ImageIndex.from_names(image_names)
+            if self.is_completed():
+                self.lease_images()
+            messagebox.showwarning('Lease expired', 'The lease of {} expired and the image was leased to another '
+                                                    'annotator, it is skipped.'.format(filename))
+        else:
+            self.annotations[self.thumbnail_index], self.statuses[self.thumbnail_index] = previous
+            self.current_coordinates = copy.deepcopy(previous[0])
+            messagebox.showwarning('Lease expired', 'The lease of {} expired and the image was leased to another '
+                                                    'annotator, changes are not saved.'.format(filename))
+
+        if self.is_completed():
+            self.show_completed_screen()
+        else:
+            self.update_image()
+
+    def report_draft_error(self, source, filename, error):
+        ''' Warn the first time drafts of a source fail, after which images it fails on are shown without a draft '''
+
+        if source in self.draft_errors:
+            return
+        self.draft_errors.add(source)
+        messagebox.showwarning('{} failed'.format(source), '{} of {} failed: {}\n\nImages it fails on are shown '
+                                                           'without a draft.'.format(source, filename, error))
+
+    def on_image_release(self, event):
+        ''' Place body part marker '''
+
+        # Stop dragging
+        if self.is_dragging:
+            self.is_dragging = False
+            return
+
+        # Do nothing if all markers are placed
+        if self.body_part_index >= NUM_BODY_PARTS:
+            return
+
+        # Place body part marker and association lines according to event position
+        normalized_x = event.x / self.image.width
+        normalized_y = event.y / self.image.height
+        self.current_coordinates[self.body_part_index] = (
+            normalized_x, normalized_y)
+        marker = self.markers[self.body_part_index]
+        self.top_canvas.coords(marker, event.x - self.marker_radius, event.y - self.marker_radius,
+                               event.x + self.marker_radius, event.y + self.marker_radius)
+        parent_index = BODY_PART_PARENT_INDEX[self.body_part_index]
+        normalized_x_parent, normalized_y_parent = self.current_coordinates[parent_index]
+        x_pos_parent = normalized_x_parent * self.image.width
+        y_pos_parent = normalized_y_parent * self.image.height
+        line = self.lines[self.body_part_index]
+        self.top_canvas.coords(line, event.x, event.y, x_pos_parent, y_pos_parent)
+
+        # If during training, check if the point is correctly placed
+        if self.is_training:
+            margin = TRAINING_MARGIN
+
+            ground_truth_x, ground_truth_y = self.ground_truth_annotations[
+                self.thumbnail_index][self.body_part_index]
+
+            if not ((abs(normalized_x - ground_truth_x) < margin) and (abs(normalized_y - ground_truth_y) < margin)):
+                # Point is placed outside the margin
+
+                color = 'grey'
+                self.top_canvas.itemconfig(
+                    marker, fill=color, outline='white')
+
+                line = self.lines[self.body_part_index]
+                self.top_canvas.itemconfig(
+                    line, fill=color, width=self.line_width)
+
+                return
+
+            # Change descriptive text
+            self.update_image_text()
+
+            # Update guideline image
+            self.add_guideline_image(self.body_part_index)
+
+        # Make marker visible
+        color = BODY_PART_COLORS[self.body_part_index]
+        self.top_canvas.itemconfig(
+            marker, fill=color, outline='white')
+
+        # Make association line visible
+        self.top_canvas.itemconfig(
+            line, fill=BODY_PART_COLORS[parent_index], width=self.line_width)
+
+        # Iterate to the next body part
+        if self.event_log is not None:
+            self.event_log.body_part_placed(self.body_part_index)
+        self.body_part_index += 1
+
+        # Change descriptive text
+        self.update_image_text()
+
+        # Update guideline image
+        self.add_guideline_image(self.body_part_index)
+
+    def on_marker_click(self, event):
+        ''' Start tracking of item when clicked '''
+
+        # Start dragging
+        self.is_dragging = True
+
+        # Record the respective body part marker item and the location
+        self.flush_drag()
+        self.drag_pointer = None
+        self._drag_data["item"] = self.top_canvas.find_closest(event.x, event.y)[
+            0]
+        self._drag_data["x"] = event.x
+        self._drag_data["y"] = event.y
+        self.start_coord = (event.x, event.y)
+
+    def on_marker_right_click(self, event):
+        ''' Change transparency of body part marker '''
+
+        # Locate clicked body part marker item
+        body_part = self.top_canvas.find_closest(event.x, event.y)[0]
+        body_part_index = self.marker_body_parts[body_part]
+
+        # Change transparency according to previous status
+        if body_part in self.absent_body_parts:
+            # Increase transparency
+            self.absent_body_parts.remove(body_part)
+            self.top_canvas.itemconfig(
+                body_part, fill=BODY_PART_COLORS[body_part_index], outline='white', width=1)
+
+        else:
+            # Remove transparency
+            self.absent_body_parts.add(body_part)
+            self.top_canvas.itemconfig(
+                body_part, fill='white', outline=BODY_PART_COLORS[body_part_index], width=5)
+
+    def on_marker_motion(self, event):
+        ''' Record the latest position of the tracked item and schedule a single canvas update for pending events '''
+
+        # Continue dragging
+        self.is_dragging = True
+
+        # Only the latest pointer position is drawn, however many events arrive before the next idle tick
+        self.drag_pointer = (event.x, event.y)
+        if self.drag_render is None:
+            self.drag_pending_since = timeit.default_timer()
+            self.drag_render = self.root.after_idle(self.render_drag)
+
+    def flush_drag(self):
+        ''' Draw a pending position of the tracked item immediately '''
+
+        if self.drag_render is not None:
+            self.root.after_cancel(self.drag_render)
+            self.render_drag()
+
+    def render_drag(self):
+        ''' Update marker and association lines of the tracked item to the latest pointer position '''
+
+        self.drag_render = None
+        if self._drag_data["item"] is None or self.drag_pointer is None:
+            return
+        x, y = self.drag_pointer
+
+        # Move body part marker and association line according to distance of movement
+        delta_x = x - self._drag_data["x"]
+        delta_y = y - self._drag_data["y"]
+        self.top_canvas.move(self._drag_data["item"], delta_x, delta_y)
+        current_body_part_index = self.marker_body_parts[self._drag_data["item"]]
+        parent_index = BODY_PART_PARENT_INDEX[current_body_part_index]
+        if current_body_part_index == parent_index:
+            self.top_canvas.coords(
+                self.lines[current_body_part_index], x, y, x, y)
+        else:
+            normalized_x_parent, normalized_y_parent = self.current_coordinates[parent_index]
+            x_pos_parent = normalized_x_parent * self.image.width
+            y_pos_parent = normalized_y_parent * self.image.height
+            self.top_canvas.coords(
+                self.lines[current_body_part_index], x, y, x_pos_parent, y_pos_parent)
+
+        # Update association lines for children
+        for child_index in BODY_PART_CHILD_INDICES[current_body_part_index]:
+            normalized_x_child, normalized_y_child = self.current_coordinates[child_index]
+            x_pos_child = normalized_x_child * self.image.width
+            y_pos_child = normalized_y_child * self.image.height
+            self.top_canvas.coords(
+                self.lines[child_index], x, y, x_pos_child, y_pos_child)
+
+        # Record the new position and the time from the first pending event until it is drawn
+        self._drag_data["x"] = x
+        self._drag_data["y"] = y
+        if self.metrics is not None:
+            self.metrics.record('drag_event_to_paint', timeit.default_timer() - self.drag_pending_since)
+
+    def on_marker_release(self, event):
+        ''' Stop tracking of item when pressed '''
+
+        # Draw the last motion before the item is released
+        self.flush_drag()
+
+        # Update x coordinate
+        normalized_x = event.x / self.image.width
+        if normalized_x < 0.0:
+            normalized_x = 0.0
+        elif normalized_x > 1.0:
+            normalized_x = 1.0
+
+        # Update y coordinate
+        normalized_y = event.y / self.image.height
+        if normalized_y < 0.0:
+            normalized_y = 0.0
+        elif normalized_y > 1.0:
+            normalized_y = 1.0
+
+        # Update coordinates according to new location
+        body_part_index = self.marker_body_parts[self._drag_data["item"]]
+        self.current_coordinates[body_part_index] = (
+            normalized_x, normalized_y)
+        if self.event_log is not None and self.drag_pointer is not None:
+            self.event_log.body_part_dragged(body_part_index)
+
+        # Terminate drag of body part marker item
+        self._drag_data["item"] = None
+        self._drag_data["x"] = 0
+        self._drag_data["y"] = 0
+
+        if self.is_training and (body_part_index == self.body_part_index):
+            margin = TRAINING_MARGIN
+            marker = self.markers[self.body_part_index]
+
+            ground_truth_x, ground_truth_y = self.ground_truth_annotations[
+                self.thumbnail_index][self.body_part_index]
+
+            if not ((abs(normalized_x - ground_truth_x) < margin) and (abs(normalized_y - ground_truth_y) < margin)):
+
+                color = 'grey'
+                self.top_canvas.itemconfig(
+                    marker, fill=color, outline='white')
+
+                line = self.lines[body_part_index]
+                self.top_canvas.itemconfig(
+                    line, fill='grey', width=self.line_width)
+
+            else:
+
+                # Make marker visible
+                color = BODY_PART_COLORS[self.body_part_index]
+                self.top_canvas.itemconfig(
+                    marker, fill=color, outline='white')
+
+                # Draw association line
+                parent_index = BODY_PART_PARENT_INDEX[body_part_index]
+                line = self.lines[body_part_index]
+                self.top_canvas.itemconfig(
+                    line, fill=BODY_PART_COLORS[parent_index], width=self.line_width)
+
+                # Iterate to the next body part
+                self.body_part_index += 1
+
+                # Change descriptive text
+                self.update_image_text()
+
+        elif self.body_part_index < NUM_BODY_PARTS:
+
+            # Change descriptive text
+            self.update_image_text()
+
+        # Update guideline image
+        self.add_guideline_image(body_part_index)
+
+    def on_right_click(self, event):
+        ''' Act if confirm button is pressed '''
+
+        self.on_confirm_click(event)
+
+    def on_complete_training(self, event=None):
+
+        # Clean UI
+        self.hide_completed_screen()
+        self.image_cache.close()
+
+        self.root.destroy()
+        root = tk.Tk()
+        root.title("Annotation program")
+
+        self.__init__(root, self.args)
+        self.update_image()
+
+    def update_image_text(self):
+        ''' Update descriptive text when body part is correctly annotated '''
+
+        # More body parts to annotate in this example
+        if self.is_training:
+            text = BODY_PART_NAMES[self.body_part_index] if self.body_part_index < NUM_BODY_PARTS else None
+
+        # Completed annotating this example
+        elif self.body_part_index == NUM_BODY_PARTS:
+            text = "Image: {} out of {} ".format(self.thumbnail_index + 1, len(self.thumbnails))
+        else:
+            text = "{}\nImage: {} out of {} ".format(
+                BODY_PART_NAMES[self.body_part_index], self.thumbnail_index + 1, len(self.thumbnails))
+
+        if text is None:
+            self.layer.hide('image_text')
+        else:
+            self.layer.text('image_text', self.image.width * 0.5, self.image.height * 0.96, text=text,
+                            fill="#ffffff", font=self.layer.font(15), justify=tk.CENTER)
+
+    #
+    # Methods for changing image
+    #
+
+    def update_image(self):
+        ''' Perform GUI update and store information due to change of image '''
+
+        # Extract information for upcoming image
+        thumbnail = self.thumbnails[self.thumbnail_index]
+        file_path = os.path.join(self.thumbnails_path, thumbnail)
+
+        # Annotation photo
+        self.load_image(file_path)
+        if self.event_log is not None:
+            self.event_log.image_shown(self.thumbnail_index, thumbnail)
+        self.prefetch_images()
+        self.top_canvas.coords(self.annotation_frame, 3, 3)
+        self.top_canvas.itemconfigure(self.annotation_frame, image=self.tk_image)
+
+        # Adjust dimensions according to current image height
+        width, height = self.image.size
+        self.main_frame.config(width=width)
+        self.top_canvas.config(width=width, height=height)
+        self.bottom_canvas.config(width=width - 4)
+        
+        # Reinitiate markers on a copy of the stored coordinates, which only replaces them once confirmed
+        if self.thumbnail_index < len(self.annotations):
+            self.current_coordinates = copy.deepcopy(self.annotations[self.thumbnail_index])
+            self.draw_markers()
+        else:
+            self.reset_lines()
+            self.reset_markers()
+
+        # Pre-fill markers of a new image when its keypoints are predicted
+        if self.draft_poll is not None:
+            self.root.after_cancel(self.draft_poll)
+            self.draft_poll = None
+        self.root.after_idle(self.apply_draft)
+
+        # Change image text
+        self.update_image_text()
+
+        # Update guideline image
+        self.add_guideline_image(self.body_part_index)
+        
+        # Force markers in front
+        for i in range(NUM_BODY_PARTS):
+            marker = self.markers[i]
+            self.top_canvas.lift(marker)
+
+    def is_new_image(self):
+        ''' Returns True if the image does not already exist '''
+
+        return self.thumbnail_index == len(self.annotations)
+
+    def is_skipped(self, index):
+        ''' Returns True if keypoints of the image were interpolated between keyframes or copied from a near-duplicate
+            instead of annotated '''
+
+        return 0 <= index < len(self.statuses) and self.statuses[index] in (INTERPOLATED_STATUS, DUPLICATE_STATUS)
+
+    def get_original(self, index):
+        ''' Returns the position of the confirmed image the image is a near-duplicate of, or None '''
+
+        if self.duplicates is None or index >= len(self.duplicates):
+            return None
+        original = int(self.duplicates[index])
+        if original == index or original >= len(self.statuses) or self.statuses[original] != 'True':
+            return None
+        return original
+
+    def skip_images(self):
+        ''' Advance past images not annotated by hand, storing keypoints of new near-duplicates of confirmed images
+            when they are skipped '''
+
+        while not self.is_completed():
+            if self.is_skipped(self.thumbnail_index):
+                self.thumbnail_index += 1
+            elif self.args.duplicates == 'skip' and self.is_new_image() and \
+                    self.get_original(self.thumbnail_index) is not None:
+                original = self.get_original(self.thumbnail_index)
+                self.annotations.append([tuple(coordinates) for coordinates in
+                                         np.asarray(self.annotations[original]).tolist()])
+                self.statuses.append(DUPLICATE_STATUS)
+                self.save_to_datastore()
+                self.thumbnail_index += 1
+            else:
+                break
+
+    def previous_image(self, event=None):
+        '''  Change to previous image '''
+
+        # Skip images not annotated by hand
+        index = self.thumbnail_index - 1
+        while self.is_skipped(index):
+            index -= 1
+
+        if index < 0:
+            # Do nothing if you are on the first image
+            return
+
+        # Update information according to previous image
+        self.thumbnail_index = index
+        if self.event_log is not None:
+            self.event_log.image_revisited(self.thumbnail_index)
+        self.current_coordinates = copy.deepcopy(self.annotations[self.thumbnail_index])
+        self.update_image()
+
+        # Last image overall
+        if self.thumbnail_index < len(self.thumbnails):
+            # Remove completed text
+            self.hide_completed_screen()
+
+        # Display full body configuration
+        self.body_part_index = NUM_BODY_PARTS
+        self.add_guideline_image(self.body_part_index)
+
+    def next_image(self, event=None):
+        ''' Change to next image '''
+
+        # Lease more images when all leased images are annotated
+        if self.lease_pool is not None and self.thumbnail_index + 1 >= len(self.thumbnails):
+            self.lease_images()
+
+        # Increase thumbnail index
+        if self.is_completed():
+            pass
+        else:
+            self.thumbnail_index += 1
+            self.skip_images()
+
+        if self.is_training and self.is_completed():
+            self.show_completed_training_screen()
+            
+        # Update information according to next image
+        elif self.is_completed():
+            self.show_completed_screen()
+        else:
+            self.update_image()
+
+    def is_completed(self):
+        ''' Check if all images have been annotated '''
+
+        return self.thumbnail_index == len(self.thumbnails)
+
+    def save_to_datastore(self):
+        ''' Store information of current image to csv file '''
+
+        # Append to the journal instead of rewriting the whole file
+        filename = self.thumbnails[self.thumbnail_index]
+        try:
+            self.datastore.save_annotation(
+                index=self.thumbnail_index, filename=filename,
+                annotation=self.annotations[self.thumbnail_index], status=self.statuses[self.thumbnail_index])
+        except LeaseError:
+            # Leases expire e.g. while the computer sleeps, lease the image again unless another annotator took it
+            if self.lease_pool is None or not self.lease_pool.reclaim(filename):
+                raise
+            self.datastore.save_annotation(
+                index=self.thumbnail_index, filename=filename,
+                annotation=self.annotations[self.thumbnail_index], status=self.statuses[self.thumbnail_index])
+
+        # Mark image as done in the shared pool
+        if self.lease_pool is not None:
+            self.lease_pool.complete(filename)
+
+    def show_completed_screen(self):
+        ''' Display message for completing annotation work '''
+
+        # Create completion screen
+        if len(self.completed_objects) == 0:
+            self.layer.rectangle('completed_rectangle', self.image.width * 0.10, self.image.height * 0.25,
+                                 self.image.width * 0.9, self.image.height * 0.75, fill="#ffffff")
+            self.layer.text('completed_main_text', self.image.width * 0.5, self.image.height * 0.3,
+                            text="Annotation completed!", fill="#000000", font=self.layer.font(25))
+            self.layer.text('completed_descriptive_text', self.image.width * 0.5, self.image.height * 0.4,
+                            text="Thank you very much for your contribution \nannotating images for a good cause!",
+                            fill="#000000", font=self.layer.font(15), justify=tk.CENTER)
+
+            # Display prize, resized only when the image height changes
+            height = int(self.image.height * 0.25)
+            if self.prize_image is None or self.prize_image.height() != height:
+                prize_image_path = os.path.join(BASE_DIR, 'frontend', 'prize.png')
+                with Image.open(prize_image_path) as prize_img:
+                    prize_img = prize_img.resize((height, height))
+                self.prize_image = ImageTk.PhotoImage(prize_img, size=prize_img.size)
+            self.layer.image('completed_prize', self.image.width * 0.5, self.image.height * 0.585,
+                             image=self.prize_image)
+
+            self.completed_objects = ['completed_rectangle', 'completed_main_text', 'completed_descriptive_text',
+                                      'completed_prize']
+
+    def show_completed_training_screen(self):
+        ''' Display message for completing training '''
+
+        # Create completion screen
+        self.layer.rectangle('training_rectangle', self.image.width * 0.10, self.image.height * 0.4,
+                             self.image.width * 0.9, self.image.height * 0.75, fill="#ffffff")
+        self.layer.text('training_main_text', self.image.width * 0.5, self.image.height * 0.45,
+                        text="Training completed!", fill="#000000", font=self.layer.font(25))
+        self.layer.text('training_descriptive_text', self.image.width * 0.5, self.image.height * 0.61,
+                        text="Did you know?\nIf you are confident that you place\nthe markers correctly, training can be\n skipped by pressing 'E'.\n\nGood luck annotating!",
+                        fill="#000000", font=self.layer.font(15), justify=tk.CENTER)
+        if self.continue_button is None:
+            self.continue_button = tk.Button(
+                self.top_canvas, width=22, height=1, text="START TO ANNOTATE", bg="white", fg="black", borderwidth=0, default='active', command=self.on_complete_training)
+            self.continue_button.config(font=('helvetica', 24, 'bold'))
+        self.layer.window('training_continue_button', self.image.width * 0.5, self.image.height * 0.65, anchor=tk.N,
+                          window=self.continue_button)
+        self.completed_objects = ['training_rectangle', 'training_main_text', 'training_descriptive_text',
+                                  'training_continue_button']
+
+    def hide_completed_screen(self):
+        ''' Hide message for completing annotation work or training '''
+
+        self.layer.hide(*self.completed_objects)
+        self.completed_objects = []
+
+    def do_training(self):
+        ''' Start program in training mode '''
+
+        # Initialize
+        self.is_training = True
+        self.thumbnail_index = 0
+        self.body_part_index = 0
+        self.hide_completed_screen()
+
+        # Load a datastore with the 'true' annotations for training examples
+        ground_truth_csv = os.path.join(TRAINING_DIR, 'ground_truth.csv')
+        self.ground_truth = Datastore(ground_truth_csv)
+        self.time_datastore(self.ground_truth)
+        self.ground_truth_annotations = self.ground_truth.get_annotations()
+
+        # Create an empty datastore for the training annotations
+        training_csv = os.path.join(TRAINING_DIR, 'training.csv')
+
+        if os.path.isfile(training_csv):
+            os.remove(training_csv)
+
+        self.datastore = Datastore(training_csv)
+        self.time_datastore(self.datastore)
+        self.annotations = self.datastore.get_annotations()
+        self.statuses = self.datastore.get_statuses()
+
+        # Load the training images
+        self.thumbnails_path = os.path.join(TRAINING_DIR, 'images')
+        self.thumbnails = get_image_names(
+            self.thumbnails_path, shuffle=False, training=True)
+
+        self.update_image()
+
+
+def store_session(annotate):
+    ''' Store number of images annotated and time of session '''
+
+    if not annotate.is_training:
+
+        # Compute number of images annotated from the statuses in memory, which match the datastore
+        statuses = annotate.statuses
+        last_index = next((i for i in range(len(statuses) - 1, -1, -1) if statuses[i] == 'True'), -1)
+        num_images_annotated = last_index - annotate.start_image
+
+        # Compute time spent and date of termination
+        seconds_spent = timeit.default_timer() - annotate.start_time
+        date = str(datetime.now()).split()[0]
+
+        # Write to file
+        if not os.path.exists(SESSIONS_PATH):
+            with open(SESSIONS_PATH, "w") as file:
+                file.write("Number of images annotated,Seconds spent,Date")
+                file.close()
+        with open(SESSIONS_PATH, "a") as file:
+            file.write("\n{},{},{}".format(
+                num_images_annotated, seconds_spent, date))
+            file.close()
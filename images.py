@@ -0,0 +1,248 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+
+from skeleton import NUM_BODY_PARTS, GUIDELINE_FOLDER
+from defaults import DISPLAY_CACHE_PATH, IMAGE_CACHE_MB, RESAMPLE_PRESET_NAMES
+
+
+PREFETCH_WORKERS = 2
+DRAFT_MIN_SCALE = 2
+RESAMPLE_PRESETS = dict(zip(RESAMPLE_PRESET_NAMES, (Image.Resampling.BILINEAR, Image.Resampling.BICUBIC,
+                                                    Image.Resampling.LANCZOS)))
+DISPLAY_CACHE_QUALITY = 95
+ORIENTATION_TAG = 0x0112
+
+
+class ImageCache:
+    ''' A memory-bounded least recently used cache of decoded images resized to the display, filled by a thread pool '''
+
+    def __init__(self, max_size, max_bytes=IMAGE_CACHE_MB * 1024 * 1024, workers=PREFETCH_WORKERS, resample='balanced',
+                 display_cache=None):
+        self.max_size = max_size
+        self.resample = resample
+        self.max_bytes = max_bytes
+        self.display_cache = display_cache
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.images = OrderedDict()
+        self.pending = {}
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        ''' Returns the resized image, decoding it unless it is cached or already being prefetched '''
+
+        with self.lock:
+            if path in self.images:
+                self.hits += 1
+                self.images.move_to_end(path)
+                return self.images[path]
+            future = self.pending.get(path)
+            if future is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if future is None:
+            img = self._load(path)
+            self._store(path, img)
+            return img
+        return future.result()
+
+    def prefetch(self, paths):
+        ''' Decode images in the background unless they are cached or already being prefetched '''
+
+        with self.lock:
+            for path in paths:
+                if path not in self.images and path not in self.pending:
+                    self.pending[path] = self.executor.submit(self._decode, path)
+
+    def stats(self):
+        ''' Returns counters of cache hits and misses together with the memory in use '''
+
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'images': len(self.images), 'bytes': self.num_bytes}
+
+    def close(self):
+        ''' Stop prefetching '''
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _decode(self, path):
+        try:
+            img = self._load(path)
+            self._store(path, img)
+            return img
+        finally:
+            with self.lock:
+                self.pending.pop(path, None)
+
+    def _load(self, path):
+        ''' Read the image from the display cache if it was ingested, otherwise decode it. The display cache is only
+            written by the ingest stage, such that annotating never fills the disk and an image always looks the same '''
+
+        if self.display_cache is not None:
+            img = self.display_cache.load(path)
+            if img is not None:
+                return img
+
+        return decode_image(path, self.max_size, self.resample)
+
+    def _store(self, path, img):
+        ''' Insert an image and evict the least recently used images exceeding the memory limit '''
+
+        with self.lock:
+            if path in self.images:
+                return
+            self.images[path] = img
+            self.num_bytes += image_bytes(img)
+
+            while self.num_bytes > self.max_bytes and len(self.images) > 1:
+                _, evicted = self.images.popitem(last=False)
+                self.num_bytes -= image_bytes(evicted)
+
+
+class DisplayCache:
+    ''' Images rendered at display size stored on disk, keyed by path, modification time, file size and target size '''
+
+    def __init__(self, max_size, folder=DISPLAY_CACHE_PATH, resample='balanced'):
+        self.max_size = max_size
+        self.folder = folder
+        self.resample = resample
+
+    def cache_path(self, path):
+        ''' Returns the location of the rendered image in the cache '''
+
+        stat = os.stat(path)
+        key = '{}|{}|{}|{}x{}|{}'.format(os.path.abspath(path), stat.st_mtime_ns, stat.st_size,
+                                        self.max_size[0], self.max_size[1], self.resample)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, digest[:2], digest + '.jpg')
+
+    def load(self, path):
+        ''' Returns the rendered image, or None if it is not in the cache '''
+
+        try:
+            with Image.open(self.cache_path(path)) as img:
+                img.load()
+                return img
+        except FileNotFoundError:
+            return None
+
+    def store(self, path, img):
+        ''' Add a rendered image to the cache '''
+
+        cache_path = self.cache_path(path)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+        # Write to a temporary file first, since several processes may render the same image
+        temporary_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+        img.save(temporary_path, format='JPEG', quality=DISPLAY_CACHE_QUALITY)
+        os.replace(temporary_path, cache_path)
+
+    def render(self, path):
+        ''' Add the image to the cache unless already present, returns True if it was rendered '''
+
+        if os.path.isfile(self.cache_path(path)):
+            return False
+        self.store(path, decode_image(path, self.max_size, self.resample))
+        return True
+
+
+def get_resized_size(image_size, max_size):
+    ''' Returns the largest size with the aspect ratio of the image that fits within the maximum size '''
+
+    # Calculate width
+    image_width, image_height = image_size
+    max_width, max_height = max_size
+    resized_height = max_height
+    resized_width = int(
+        (float(image_width) / float(image_height)) * float(resized_height))
+
+    # Adjust height if too wide
+    if (resized_width > max_width):
+        resized_height = int(
+            (float(image_height) / float(image_width)) * float(max_width))
+        resized_width = max_width
+
+    return (resized_width, resized_height)
+
+
+def get_image_area(screen_size):
+    ''' Returns size of the area displaying images in fullscreen mode '''
+
+    screen_width, screen_height = screen_size
+    return int(screen_width), int(screen_height * 0.85)
+
+
+def decode_image(path, max_size, resample='balanced'):
+    ''' Returns the image decoded, upright according to EXIF orientation, normalised to an 8-bit mode and resized to
+    fit within the maximum size using the given resampling preset '''
+
+    with Image.open(path) as img:
+        # Size of the upright image
+        transposed = img.getexif().get(ORIENTATION_TAG, 1) in (5, 6, 7, 8)
+        resized_size = get_resized_size(img.size[::-1] if transposed else img.size, max_size)
+        draft_size = resized_size[::-1] if transposed else resized_size
+
+        # Let the JPEG decoder scale down by a power of two when the image is much larger than needed
+        if img.width >= DRAFT_MIN_SCALE * draft_size[0] and img.height >= DRAFT_MIN_SCALE * draft_size[1]:
+            img.draft(img.mode, draft_size)
+
+        img = normalize_image(ImageOps.exif_transpose(img))
+        return img.resize(resized_size, resample=RESAMPLE_PRESETS[resample])
+
+
+def normalize_image(img):
+    ''' Returns the image in 'L' or 'RGB' mode, scaling 16-bit and 32-bit grayscale images to 8 bits '''
+
+    if img.mode in ('L', 'RGB'):
+        return img
+    if img.mode.startswith('I') or img.mode == 'F':
+        # Scale the full range of the image to 8 bits
+        img = img.convert('F')
+        low, high = img.getextrema()
+        scale = 255.0 / (high - low) if high > low else 0.0
+        return img.point(lambda value: (value - low) * scale).convert('L')
+    return img.convert('RGB')
+
+
+def load_guideline_images(height):
+    ''' Returns guideline images of every body part and of the full body, resized to the given height '''
+
+    images = []
+    for body_part_index in range(NUM_BODY_PARTS + 1):
+        guideline_image_path = os.path.join(GUIDELINE_FOLDER, '{}.png'.format(body_part_index))
+        with Image.open(guideline_image_path) as img:
+            width, image_height = img.size
+            resized_width = int((float(width) / float(image_height)) * float(height))
+            images.append(img.resize((resized_width, height)))
+
+    return images
+
+
+def image_bytes(img):
+    ''' Returns the approximate memory used by the pixels of an image '''
+
+    return img.width * img.height * len(img.getbands())
+
+
+def get_upright_size(path):
+    ''' Returns the size of an image after applying its EXIF orientation, reading only the file header '''
+
+    with Image.open(path) as img:
+        width, height = img.size
+        if img.getexif().get(ORIENTATION_TAG, 1) in (5, 6, 7, 8):
+            return height, width
+        return width, height
+
+
+def render_to_display_cache(path, max_size, folder, resample):
+    ''' Add a single image to the display cache, run by the processes of the ingest stage '''
+
+    return DisplayCache(max_size, folder, resample).render(path)
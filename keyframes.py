@@ -0,0 +1,143 @@
+import argparse
+import numpy as np
+
+from skeleton import NUM_BODY_PARTS
+from datastore import INTERPOLATED_STATUS, CSV_PATH, open_datastore
+from discovery import IMAGE_EXTENSIONS, get_image_names, parse_extensions, parse_frame_name
+
+
+INTERPOLATION_METHODS = ('linear', 'spline')
+
+
+def interpolate_keypoints(numbers, coordinates, query_numbers, method='linear'):
+    ''' Returns normalized coordinates of shape (len(query_numbers), NUM_BODY_PARTS, 2) of frames between keyframes,
+        interpolated from the coordinates of shape (K, NUM_BODY_PARTS, 2) of at least two keyframes with increasing
+        frame numbers. Splines are cubic Hermite splines with Catmull-Rom tangents, which pass through every keyframe '''
+
+    numbers = np.asarray(numbers, dtype=np.float64)
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    query_numbers = np.asarray(query_numbers, dtype=np.float64)
+
+    # Keyframe segment of every frame and the position of the frame within its segment, from 0 to 1
+    segments = np.clip(np.searchsorted(numbers, query_numbers, side='right') - 1, 0, len(numbers) - 2)
+    lengths = (numbers[segments + 1] - numbers[segments])[:, None, None]
+    t = (query_numbers[:, None, None] - numbers[segments, None, None]) / lengths
+    start, end = coordinates[segments], coordinates[segments + 1]
+    if method == 'linear':
+        return start + (end - start) * t
+
+    # Tangents in coordinates per frame, from both neighbours of a keyframe and one-sided at the first and last
+    tangents = np.empty_like(coordinates)
+    tangents[1:-1] = (coordinates[2:] - coordinates[:-2]) / (numbers[2:] - numbers[:-2])[:, None, None]
+    tangents[0] = (coordinates[1] - coordinates[0]) / (numbers[1] - numbers[0])
+    tangents[-1] = (coordinates[-1] - coordinates[-2]) / (numbers[-1] - numbers[-2])
+
+    t2 = t * t
+    t3 = t2 * t
+    interpolated = ((2 * t3 - 3 * t2 + 1) * start + (t3 - 2 * t2 + t) * lengths * tangents[segments] +
+                    (3 * t2 - 2 * t3) * end + (t3 - t2) * lengths * tangents[segments + 1])
+
+    # Splines may overshoot the image near its border
+    return np.clip(interpolated, 0.0, 1.0)
+
+
+def interpolate_datastore(datastore, image_names, method='linear', max_motion=None):
+    ''' Interpolate keypoints of the video frames among image_names lying between confirmed frames of the same video,
+        and store them with the interpolated status. Frames not in the datastore are appended and frames interpolated
+        before are interpolated again, other frames are left untouched. Segments between keyframes where a body part
+        moves further than max_motion are not interpolated, and frames interpolated before that are not interpolated
+        again lose their interpolated status to be annotated by hand. Returns the number of interpolated frames, the
+        number of frames returned to annotation and the video, first and last frame number of every segment left out '''
+
+    annotations, statuses, _ = datastore.load()
+    filenames = datastore.get_filenames()
+    positions = {filename: i for i, filename in enumerate(filenames)}
+
+    # Frame numbers and rows of confirmed keyframes of every video
+    keyframes = {}
+    for i, (filename, status) in enumerate(zip(filenames, statuses)):
+        frame = parse_frame_name(filename)
+        if frame is not None and status == 'True':
+            keyframes.setdefault(frame[0], []).append((frame[1], i))
+
+    # Frame numbers and names of frames to interpolate of every video with keyframes
+    frames = {}
+    for name in image_names:
+        frame = parse_frame_name(name)
+        if frame is not None and frame[0] in keyframes and \
+                (name not in positions or statuses[positions[name]] == INTERPOLATED_STATUS):
+            frames.setdefault(frame[0], []).append((frame[1], name))
+
+    new_filenames, new_annotations, left_out = [], [], []
+    interpolated_names = set()
+    for video, video_frames in frames.items():
+        numbers, rows = zip(*sorted(keyframes[video]))
+        numbers, unique = np.unique(numbers, return_index=True)
+        if len(numbers) < 2:
+            continue
+        coordinates = annotations[np.array(rows)[unique]]
+        query_numbers = np.array([number for number, _ in video_frames])
+        names = [name for _, name in video_frames]
+
+        # Only frames strictly between keyframes of segments without fast motion are interpolated
+        inside = (query_numbers > numbers[0]) & (query_numbers < numbers[-1]) & ~np.isin(query_numbers, numbers)
+        segments = np.searchsorted(numbers, query_numbers, side='right') - 1
+        if max_motion is not None:
+            fast = np.linalg.norm(np.diff(coordinates, axis=0), axis=2).max(axis=1) > max_motion
+            # Segments with frames between their keyframes are listed, also when the frames were left out before
+            fast_segments = np.flatnonzero(fast & (np.diff(numbers) > 1))
+            left_out.extend((video, int(numbers[segment]), int(numbers[segment + 1])) for segment in fast_segments)
+            inside &= ~np.isin(segments, fast_segments)
+
+        selected = np.flatnonzero(inside)
+        interpolated = interpolate_keypoints(numbers, coordinates, query_numbers[selected], method)
+        for i, annotation in zip(selected.tolist(), interpolated):
+            interpolated_names.add(names[i])
+            if names[i] in positions:
+                annotations[positions[names[i]]] = annotation
+            else:
+                new_filenames.append(names[i])
+                new_annotations.append(annotation)
+
+    # Frames interpolated before but not now, e.g. in segments left out, go back to the annotation queue
+    image_names = set(image_names)
+    reset = [i for i, (filename, status) in enumerate(zip(filenames, statuses))
+             if status == INTERPOLATED_STATUS and filename in image_names and filename not in interpolated_names]
+    for i in reset:
+        statuses[i] = ''
+
+    # Rewrite the datastore once with all interpolated frames
+    if interpolated_names or reset:
+        annotations = np.concatenate([annotations, np.reshape(new_annotations, (-1, NUM_BODY_PARTS, 2))])
+        datastore.save_annotations(filenames + new_filenames, annotations,
+                                   statuses + [INTERPOLATED_STATUS] * len(new_filenames))
+
+    return len(interpolated_names), len(reset), sorted(left_out)
+
+
+def main(args):
+    ''' Interpolate keypoints of video frames between confirmed keyframes '''
+
+    image_names = get_image_names(args.image_folder, extensions=args.extensions)
+    num_interpolated, num_reset, left_out = interpolate_datastore(open_datastore(args.annotations), image_names,
+                                                                  args.method, args.max_motion)
+
+    print("Interpolated {} frames in {}".format(num_interpolated, args.annotations))
+    if num_reset:
+        print("{} frames interpolated before are no longer interpolated and need to be annotated".format(num_reset))
+    if left_out:
+        print("{} segments move more than {} and need more keyframes:".format(len(left_out), args.max_motion))
+        for video, first, last in left_out:
+            print("  {}[{:04d}] to [{:04d}]".format(video, first, last))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--annotations', type=str, default=CSV_PATH, help='Path of annotations with confirmed keyframes')
+    parser.add_argument('--image-folder', type=str, required=True, dest='image_folder', help='Path of folder with the video frames')
+    parser.add_argument('--extensions', type=parse_extensions, default=IMAGE_EXTENSIONS, help='Comma-separated file extensions of images, matched case-insensitively')
+    parser.add_argument('--method', type=str, default='linear', choices=INTERPOLATION_METHODS, help='Interpolation between keyframes')
+    parser.add_argument('--max-motion', type=float, dest='max_motion', help='Largest distance in normalized coordinates a body part may move between keyframes for the frames between them to be interpolated')
+    args = parser.parse_args()
+
+    main(args)
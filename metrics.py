@@ -0,0 +1,180 @@
+import os
+import json
+import timeit
+import functools
+from datetime import datetime
+
+
+HISTOGRAM_SUB_BUCKET_BITS = 6
+HISTOGRAM_MAX_MICROSECONDS = 2 ** 40
+PROMETHEUS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                      10.0)
+SUMMARY_PERCENTILES = (50, 90, 99, 99.9)
+PROMETHEUS_FILE_NAME = 'metrics.prom'
+SUMMARY_FILE_NAME = 'metrics.json'
+
+
+class LatencyHistogram:
+    ''' A histogram of latencies in microseconds with buckets of constant relative width, as in HDR histograms: values
+        are recorded with 2 ** HISTOGRAM_SUB_BUCKET_BITS sub-buckets per power of two, so within about 3 % '''
+
+    def __init__(self, sub_bucket_bits=HISTOGRAM_SUB_BUCKET_BITS, max_value=HISTOGRAM_MAX_MICROSECONDS):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.half = 2 ** (sub_bucket_bits - 1)
+        self.max_value = max_value
+        self.counts = [0] * (self.bucket_index(max_value) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def bucket_index(self, value):
+        ''' Returns the index of the bucket of an integer value '''
+
+        shift = max(value.bit_length() - self.sub_bucket_bits, 0)
+        return shift * self.half + (value >> shift)
+
+    def bucket_bounds(self, index):
+        ''' Returns the lowest value and the value just above a bucket '''
+
+        if index < 2 * self.half:
+            return index, index + 1
+        shift = index // self.half - 1
+        lowest = (index - shift * self.half) << shift
+        return lowest, lowest + (1 << shift)
+
+    def record(self, seconds):
+        ''' Add a latency given in seconds '''
+
+        value = min(int(seconds * 1e6), self.max_value)
+        self.counts[self.bucket_index(value)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, percent):
+        ''' Returns the latency in seconds below which the given percentage of recorded latencies fall '''
+
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(percent / 100.0 * self.count)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bucket_bounds(index)[1] / 1e6, self.max)
+        return self.max
+
+    def cumulative_counts(self, bounds):
+        ''' Returns the number of latencies at or below each of the given bounds in seconds '''
+
+        cumulative = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            while index < len(self.counts) and self.bucket_bounds(index)[1] <= bound * 1e6:
+                seen += self.counts[index]
+                index += 1
+            cumulative.append(seen)
+        return cumulative
+
+    def summary(self):
+        ''' Returns count, mean, extremes and percentiles in milliseconds '''
+
+        summary = {'count': self.count,
+                   'mean_ms': self.total / self.count * 1e3 if self.count else 0.0,
+                   'min_ms': (self.min or 0.0) * 1e3,
+                   'max_ms': (self.max or 0.0) * 1e3}
+        for percent in SUMMARY_PERCENTILES:
+            summary['p{:g}_ms'.format(percent)] = self.percentile(percent) * 1e3
+        return summary
+
+
+class Metrics:
+    ''' Latency histograms of named operations and counters of components, written as a Prometheus text file and a json
+        summary '''
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.histograms = {}
+        self.counters = {}
+        self.start_time = datetime.now()
+
+    def record(self, name, seconds):
+        ''' Add a latency of an operation '''
+
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def add_counters(self, name, function):
+        ''' Report the counters returned as a dictionary by a function, called whenever metrics are written. Counters
+            added again under the same name replace the earlier function '''
+
+        self.counters[name] = function
+
+    def timed(self, name, function):
+        ''' Returns the function wrapped to record the latency of every call '''
+
+        record = self.record
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = timeit.default_timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, timeit.default_timer() - start)
+
+        return wrapper
+
+    def instrument(self, obj, names, prefix=''):
+        ''' Replace methods of an object by timed methods, such that nothing is added to untimed objects. Methods are
+            taken from the class, so instrumenting an object again replaces earlier timed methods '''
+
+        for name in names:
+            setattr(obj, name, self.timed(prefix + name, getattr(type(obj), name).__get__(obj)))
+
+    def prometheus_text(self):
+        ''' Returns histograms in the Prometheus text exposition format '''
+
+        lines = ['# HELP annotate_latency_seconds Latency of operations of the annotation program',
+                 '# TYPE annotate_latency_seconds histogram']
+        for name, histogram in sorted(self.histograms.items()):
+            for bound, count in zip(PROMETHEUS_BUCKETS, histogram.cumulative_counts(PROMETHEUS_BUCKETS)):
+                lines.append('annotate_latency_seconds_bucket{{operation="{}",le="{:g}"}} {}'.format(name, bound, count))
+            lines.append('annotate_latency_seconds_bucket{{operation="{}",le="+Inf"}} {}'.format(name, histogram.count))
+            lines.append('annotate_latency_seconds_sum{{operation="{}"}} {!r}'.format(name, histogram.total))
+            lines.append('annotate_latency_seconds_count{{operation="{}"}} {}'.format(name, histogram.count))
+
+        for name, function in sorted(self.counters.items()):
+            for counter, value in sorted(function().items()):
+                lines.append('annotate_{}_{} {!r}'.format(name, counter, value))
+
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        ''' Returns a json-serializable summary of all histograms '''
+
+        return {'start': self.start_time.isoformat(), 'end': datetime.now().isoformat(),
+                'operations': {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+                'counters': {name: function() for name, function in sorted(self.counters.items())}}
+
+    def write_prometheus(self):
+        ''' Replace the Prometheus text file with the current histograms '''
+
+        self._write(PROMETHEUS_FILE_NAME, self.prometheus_text())
+
+    def write_summary(self):
+        ''' Replace the json summary with the current histograms '''
+
+        self._write(SUMMARY_FILE_NAME, json.dumps(self.summary(), indent=2))
+
+    def _write(self, file_name, text):
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, file_name)
+        with open(path + '.tmp', 'w') as f:
+            f.write(text)
+        os.replace(path + '.tmp', path)
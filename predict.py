@@ -0,0 +1,172 @@
+import os
+import multiprocessing
+import numpy as np
+
+from skeleton import NUM_BODY_PARTS
+from datastore import open_datastore
+from images import decode_image
+from score import TRAINING_DIR, load_selected
+from defaults import PREDICT_WORKERS, PREDICT_BATCH_SIZE
+
+
+GROUND_TRUTH_PATH = os.path.join(TRAINING_DIR, 'ground_truth.csv')
+ONNX_INPUT_SIZE = (192, 256)
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+class MeanPosePredictor:
+    ''' Predicts the same pose for every image, the mean of annotations of a datastore '''
+
+    def __init__(self, annotations=GROUND_TRUTH_PATH, statuses=None):
+        _, coordinates = load_selected(open_datastore(annotations, training=True, read_only=True), statuses)
+        if not len(coordinates):
+            raise ValueError('No annotations to average in {}'.format(annotations))
+        self.pose = coordinates.mean(axis=0)
+
+    def predict(self, paths):
+        ''' Returns normalized coordinates of shape (len(paths), NUM_BODY_PARTS, 2) '''
+
+        return np.repeat(self.pose[None], len(paths), axis=0)
+
+
+class OnnxPredictor:
+    ''' Predicts keypoints with an ONNX model on the CPU. The model takes RGB images normalized with ImageNet statistics
+        of shape (N, 3, H, W), and returns heatmaps of shape (N, NUM_BODY_PARTS, h, w) or normalized coordinates of
+        shape (N, NUM_BODY_PARTS, 2) '''
+
+    def __init__(self, model_path, input_size=None):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("The ONNX predictor requires onnxruntime, install it by 'pip install onnxruntime'")
+
+        self.session = onnxruntime.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+
+        # Use the input size of the model unless it accepts any size
+        height, width = model_input.shape[2:]
+        if input_size is None:
+            input_size = (width, height) if isinstance(width, int) and isinstance(height, int) else ONNX_INPUT_SIZE
+        self.input_size = input_size
+
+    def preprocess(self, path):
+        ''' Returns the image as a normalized array of shape (3, H, W), stretched to the input size such that
+            coordinates normalized to the input are normalized to the image '''
+
+        img = decode_image(path, self.input_size, resample='fast').convert('RGB').resize(self.input_size)
+        return ((np.asarray(img, dtype=np.float32) / 255.0 - IMAGENET_MEAN) / IMAGENET_STD).transpose(2, 0, 1)
+
+    def predict(self, paths):
+        ''' Returns normalized coordinates of shape (len(paths), NUM_BODY_PARTS, 2) '''
+
+        batch = np.stack([self.preprocess(path) for path in paths])
+        return decode_output(self.session.run(None, {self.input_name: batch})[0])
+
+
+def decode_output(output):
+    ''' Returns normalized coordinates of shape (N, NUM_BODY_PARTS, 2) from heatmaps or coordinates output by a model '''
+
+    if output.ndim < 3 or output.shape[1] != NUM_BODY_PARTS:
+        raise ValueError('Expected output with {} body parts, got shape {}'.format(NUM_BODY_PARTS, output.shape))
+
+    if output.ndim == 4:
+        # Locate the maximum of every heatmap, at the center of its cell
+        num_images, num_body_parts, height, width = output.shape
+        peaks = output.reshape(num_images, num_body_parts, -1).argmax(axis=2)
+        coordinates = np.stack([(peaks % width + 0.5) / width, (peaks // width + 0.5) / height], axis=2)
+    else:
+        coordinates = output[..., :2]
+
+    return np.clip(coordinates.astype(np.float64), 0.0, 1.0)
+
+
+def open_predictor(spec):
+    ''' Returns the predictor given on the command line: 'mean' for the mean pose of the training ground truth,
+        'mean:<annotations>' for the mean of confirmed annotations of a datastore, or the path of an ONNX model '''
+
+    if spec == 'mean':
+        return MeanPosePredictor()
+    if spec.startswith('mean:'):
+        return MeanPosePredictor(spec[len('mean:'):], statuses=['True'])
+    if spec.endswith('.onnx'):
+        return OnnxPredictor(spec)
+    raise ValueError("Unknown predictor '{}', expected 'mean', 'mean:<annotations>' or an '.onnx' model".format(spec))
+
+
+def check_predictor(spec):
+    ''' Raises ValueError unless the predictor given on the command line is known and its file exists '''
+
+    if spec != 'mean' and not spec.startswith('mean:') and not spec.endswith('.onnx'):
+        raise ValueError("Unknown predictor '{}', expected 'mean', 'mean:<annotations>' or an '.onnx' model".format(spec))
+    path = spec[len('mean:'):] if spec.startswith('mean:') else spec
+    if spec != 'mean' and not os.path.exists(path):
+        raise ValueError("Predictor file '{}' does not exist".format(path))
+
+
+# Predictor of a worker process, loaded once when the process starts
+worker_predictor = None
+
+
+def initialize_worker(spec):
+    global worker_predictor
+    worker_predictor = open_predictor(spec)
+
+
+def predict_batch(paths):
+    return worker_predictor.predict(paths)
+
+
+class PreAnnotator:
+    ''' Keypoints predicted in batches by a pool of processes for images ahead of the annotator '''
+
+    def __init__(self, spec, workers=PREDICT_WORKERS, batch_size=PREDICT_BATCH_SIZE):
+        # Import process pools only when predicting. Processes are spawned rather than forked, since the GUI process
+        # runs decoding threads
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Report unknown predictors here, since errors of worker processes only show when predictions are collected
+        check_predictor(spec)
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=initialize_worker, initargs=(spec,))
+        self.batch_size = batch_size
+        self.batches = {}
+
+    def prefetch(self, paths):
+        ''' Predict keypoints of images in the background unless already predicted or being predicted '''
+
+        missing = [path for path in paths if path not in self.batches]
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            future = self.executor.submit(predict_batch, batch)
+            for position, path in enumerate(batch):
+                self.batches[path] = (future, position)
+
+    def pending(self, path):
+        ''' Returns True if keypoints of the image are being predicted '''
+
+        return path in self.batches and not self.batches[path][0].done()
+
+    def get(self, path):
+        ''' Returns predicted normalized coordinates of shape (NUM_BODY_PARTS, 2), or None unless predicted. Raises the
+            error of a failed prediction, after which the images of its batch are predicted again when prefetched '''
+
+        entry = self.batches.get(path)
+        if entry is None or not entry[0].done():
+            return None
+
+        future, position = entry
+        if future.cancelled() or future.exception() is not None:
+            for other in [other for other, (other_future, _) in self.batches.items() if other_future is future]:
+                del self.batches[other]
+            if future.cancelled():
+                return None
+            raise future.exception()
+        del self.batches[path]
+        return future.result()[position]
+
+    def close(self):
+        ''' Stop predicting '''
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,181 @@
+import os
+import json
+import argparse
+import timeit
+import numpy as np
+
+from skeleton import BODY_PART_NAMES, OKS_SIGMAS
+from datastore import open_datastore, LOAD_CHUNK_SIZE
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRAINING_DIR = os.path.join(BASE_DIR, 'training')
+TRAINING_MARGIN = 0.02
+PCK_THRESHOLDS = (0.05, 0.1, 0.2)
+AREA_EPSILON = 1e-9
+
+
+def load_selected(datastore, statuses=None, chunk_size=LOAD_CHUNK_SIZE):
+    ''' Returns file names and coordinates of shape (N, NUM_BODY_PARTS, 2) of the elements with one of the given statuses '''
+
+    filenames = []
+    coordinates = []
+    for chunk_filenames, chunk_coordinates, chunk_statuses in datastore.iter_annotations(chunk_size):
+        selected = [i for i, status in enumerate(chunk_statuses) if statuses is None or status in statuses]
+        filenames.extend([chunk_filenames[i] for i in selected])
+        coordinates.append(chunk_coordinates[selected])
+
+    if not coordinates:
+        return filenames, np.empty((0, len(BODY_PART_NAMES), 2))
+    return filenames, np.concatenate(coordinates)
+
+
+def align(filenames, reference_filenames):
+    ''' Returns indices into both lists of the file names they have in common, by a hash join on file name '''
+
+    reference_positions = {filename: i for i, filename in enumerate(reference_filenames)}
+    pairs = [(i, reference_positions[filename]) for i, filename in enumerate(filenames)
+             if filename in reference_positions]
+    if not pairs:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    indices, reference_indices = np.array(pairs, dtype=np.int64).T
+
+    return indices, reference_indices
+
+
+def joint_errors(coordinates, reference):
+    ''' Returns Euclidean distances of shape (N, NUM_BODY_PARTS) between coordinates and reference coordinates '''
+
+    return np.linalg.norm(coordinates - reference, axis=-1)
+
+
+def object_extents(reference):
+    ''' Returns width and height of shape (N, 2) of the bounding box around the reference keypoints of each image '''
+
+    return reference.max(axis=1) - reference.min(axis=1)
+
+
+def within_margin(coordinates, reference, margin=TRAINING_MARGIN):
+    ''' Returns whether each keypoint is inside the square margin used for feedback during training '''
+
+    return np.all(np.abs(coordinates - reference) < margin, axis=-1)
+
+
+def pck(errors, scales, thresholds=PCK_THRESHOLDS):
+    ''' Returns the fraction of correct keypoints of shape (len(thresholds), NUM_BODY_PARTS), with errors within
+        each threshold times the scale of the object in their image '''
+
+    limits = np.asarray(thresholds)[:, None, None] * scales[None, :, None]
+    return (errors[None] <= limits).mean(axis=1)
+
+
+def keypoint_similarity(errors, areas, sigmas=OKS_SIGMAS):
+    ''' Returns the COCO keypoint similarity of shape (N, NUM_BODY_PARTS), given object areas of shape (N,) '''
+
+    variances = (2 * np.asarray(sigmas)) ** 2
+    return np.exp(-errors ** 2 / (2 * variances[None, :] * (areas[:, None] + AREA_EPSILON)))
+
+
+def score(coordinates, reference, thresholds=PCK_THRESHOLDS, margin=TRAINING_MARGIN):
+    ''' Returns per-joint and per-image accuracy of aligned coordinates against reference coordinates '''
+
+    errors = joint_errors(coordinates, reference)
+    extents = object_extents(reference)
+    similarity = keypoint_similarity(errors, extents.prod(axis=1))
+
+    return {'errors': errors,
+            'pck': pck(errors, extents.max(axis=1), thresholds),
+            'within_margin': within_margin(coordinates, reference, margin),
+            'similarity': similarity,
+            'oks': similarity.mean(axis=1)}
+
+
+def summarize(scores, filenames, thresholds, num_worst):
+    ''' Returns a json-serializable summary of scores '''
+
+    errors = scores['errors']
+    joints = {}
+    for j, body_part in enumerate(BODY_PART_NAMES):
+        joints[body_part] = {'mean_error': float(errors[:, j].mean()),
+                             'median_error': float(np.median(errors[:, j])),
+                             'within_margin': float(scores['within_margin'][:, j].mean()),
+                             'pck': {str(t): float(scores['pck'][k, j]) for k, t in enumerate(thresholds)},
+                             'mean_similarity': float(scores['similarity'][:, j].mean())}
+
+    worst = np.argsort(scores['oks'], kind='stable')[:num_worst]
+    return {'images': len(filenames),
+            'mean_error': float(errors.mean()),
+            'within_margin': float(scores['within_margin'].mean()),
+            'pck': {str(t): float(scores['pck'][k].mean()) for k, t in enumerate(thresholds)},
+            'mean_oks': float(scores['oks'].mean()),
+            'joints': joints,
+            'worst_images': [{'file': filenames[i], 'oks': float(scores['oks'][i])} for i in worst]}
+
+
+def print_report(name, summary, thresholds, num_missing, seconds):
+    ''' Print a summary as a table with a row per body part '''
+
+    print("{}: {} images scored in {:.1f} ms, {} without ground truth".format(
+        name, summary['images'], seconds * 1e3, num_missing))
+    if not summary['images']:
+        return
+
+    pck_headers = ''.join(['{:>10}'.format('PCK@{:g}'.format(t)) for t in thresholds])
+    print("{:<16}{:>10}{:>10}{:>10}{}{:>10}".format('Body part', 'Mean', 'Median', 'Margin', pck_headers, 'OKS'))
+
+    def row(body_part, mean_error, median_error, margin, pck_values, similarity):
+        pck_columns = ''.join(['{:>10.1%}'.format(value) for value in pck_values])
+        median_column = '{:>10.4f}'.format(median_error) if median_error is not None else '{:>10}'.format('')
+        print("{:<16}{:>10.4f}{}{:>10.1%}{}{:>10.3f}".format(
+            body_part, mean_error, median_column, margin, pck_columns, similarity))
+
+    for body_part, joint in summary['joints'].items():
+        row(body_part, joint['mean_error'], joint['median_error'], joint['within_margin'],
+            [joint['pck'][str(t)] for t in thresholds], joint['mean_similarity'])
+    row('All', summary['mean_error'], None, summary['within_margin'],
+        [summary['pck'][str(t)] for t in thresholds], summary['mean_oks'])
+
+    print("Lowest OKS: " + ', '.join(['{} ({:.3f})'.format(image['file'], image['oks'])
+                                       for image in summary['worst_images']]))
+
+
+def main(args):
+    ''' Score annotation files against ground truth annotations '''
+
+    thresholds = [float(threshold) for threshold in args.thresholds.split(',')]
+    statuses = set(args.statuses.split(','))
+    reference_filenames, reference = load_selected(open_datastore(args.ground_truth, training=True, read_only=True))
+
+    report = {}
+    for file_name in args.annotations:
+        filenames, coordinates = load_selected(open_datastore(file_name, training=True, read_only=True), statuses)
+
+        start = timeit.default_timer()
+        indices, reference_indices = align(filenames, reference_filenames)
+        scores = score(coordinates[indices], reference[reference_indices], thresholds, args.margin) \
+            if len(indices) else None
+        seconds = timeit.default_timer() - start
+
+        # Means over no images are undefined, so files without images in the ground truth only report their count
+        summary = summarize(scores, [filenames[i] for i in indices], thresholds, args.worst) if len(indices) else \
+            {'images': 0}
+        print_report(file_name, summary, thresholds, len(filenames) - len(indices), seconds)
+        report[file_name] = summary
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--annotations', type=str, nargs='+', default=[os.path.join(TRAINING_DIR, 'training.csv')], help='Paths of annotations to score')
+    parser.add_argument('--ground-truth', type=str, dest='ground_truth', default=os.path.join(TRAINING_DIR, 'ground_truth.csv'), help='Path of ground truth annotations')
+    parser.add_argument('--statuses', type=str, default='True', help='Comma-separated statuses of images to score')
+    parser.add_argument('--thresholds', type=str, default=','.join([str(t) for t in PCK_THRESHOLDS]), help='Comma-separated PCK thresholds, as fractions of the largest side of the ground truth bounding box')
+    parser.add_argument('--margin', type=float, default=TRAINING_MARGIN, help='Margin around ground truth used for feedback in training mode')
+    parser.add_argument('--worst', type=int, default=5, help='Number of lowest-scoring images to list')
+    parser.add_argument('--json', type=str, help='Path of json file to write the report to')
+    args = parser.parse_args()
+
+    main(args)
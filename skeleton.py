@@ -0,0 +1,72 @@
+import os
+import json
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SKELETON_ENV = 'KEYPOINT_SKELETON'
+DEFAULT_OKS_SIGMA = 0.079
+DEFAULT_COLOR = '#ffffff'
+
+# Body parts as (name, parent, OKS falloff, color), the root is its own parent. OKS falloffs are the COCO sigmas of
+# the closest COCO keypoint
+DEFAULT_BODY_PARTS = [('Head top', 'Head top', 0.035, '#fff142'), ('Nose', 'Head top', 0.026, '#fff142'),
+                      ('Right ear', 'Nose', 0.035, '#a8cf74'), ('Left ear', 'Nose', 0.035, '#a8cf74'),
+                      ('Upper neck', 'Nose', 0.079, '#fff142'), ('Right shoulder', 'Upper neck', 0.079, '#576ab1'),
+                      ('Right elbow', 'Right shoulder', 0.072, '#5883c4'), ('Right wrist', 'Right elbow', 0.062, '#56bdef'),
+                      ('Upper chest', 'Upper neck', 0.079, '#f19718'), ('Left shoulder', 'Upper neck', 0.079, '#d33592'),
+                      ('Left elbow', 'Left shoulder', 0.072, '#d962a6'), ('Left wrist', 'Left elbow', 0.062, '#e18abd'),
+                      ('Mid pelvis', 'Upper chest', 0.107, '#f19718'), ('Right pelvis', 'Mid pelvis', 0.107, '#8ac691'),
+                      ('Right knee', 'Right pelvis', 0.087, '#a3d091'), ('Right ankle', 'Right knee', 0.089, '#c0dc92'),
+                      ('Left pelvis', 'Mid pelvis', 0.107, '#7b76b7'), ('Left knee', 'Left pelvis', 0.087, '#907ab8'),
+                      ('Left ankle', 'Left knee', 0.089, '#a97fb9')]
+DEFAULT_GUIDELINE_FOLDER = os.path.join(BASE_DIR, 'frontend/body_parts')
+
+
+def load_skeleton(path):
+    ''' Returns body parts as (name, parent, OKS falloff, color) and the folder of guideline images of a json file
+        {"body_parts": [{"name": ..., "parent": ..., "oks_sigma": ..., "color": ...}, ...], "guideline_folder": ...} '''
+
+    with open(path, 'r') as f:
+        config = json.load(f)
+
+    body_parts = [(body_part['name'], body_part.get('parent', body_part['name']),
+                   float(body_part.get('oks_sigma', DEFAULT_OKS_SIGMA)), body_part.get('color', DEFAULT_COLOR))
+                  for body_part in config['body_parts']]
+
+    # Guideline images are numbered by body part, with the full body last, relative to the config file
+    guideline_folder = os.path.join(os.path.dirname(os.path.abspath(path)),
+                                    config.get('guideline_folder', DEFAULT_GUIDELINE_FOLDER))
+
+    return body_parts, guideline_folder
+
+
+def compile_topology(names, parents):
+    ''' Returns the index of the parent of each body part and the indices of the children of each body part '''
+
+    positions = {name: i for i, name in enumerate(names)}
+    if len(positions) != len(names):
+        raise ValueError('Body part names are not unique')
+    missing = [parent for parent in parents if parent not in positions]
+    if missing:
+        raise ValueError('Unknown parent body parts: {}'.format(', '.join(missing)))
+
+    parent_index = tuple(positions[parent] for parent in parents)
+    child_indices = tuple(tuple(i for i, parent in enumerate(parent_index) if parent == j and i != j)
+                          for j in range(len(names)))
+
+    return parent_index, child_indices
+
+
+# The skeleton is read from the config file named by the environment variable, if set, and compiled once at import
+if os.environ.get(SKELETON_ENV):
+    BODY_PARTS, GUIDELINE_FOLDER = load_skeleton(os.environ[SKELETON_ENV])
+else:
+    BODY_PARTS, GUIDELINE_FOLDER = DEFAULT_BODY_PARTS, DEFAULT_GUIDELINE_FOLDER
+
+BODY_PART_NAMES = [name for name, _, _, _ in BODY_PARTS]
+BODY_PART_PARENT = [parent for _, parent, _, _ in BODY_PARTS]
+OKS_SIGMAS = [sigma for _, _, sigma, _ in BODY_PARTS]
+BODY_PART_COLORS = [color for _, _, _, color in BODY_PARTS]
+NUM_BODY_PARTS = len(BODY_PART_NAMES)
+BODY_PART_PARENT_INDEX, BODY_PART_CHILD_INDICES = compile_topology(BODY_PART_NAMES, BODY_PART_PARENT)
+BODY_PART_CHILDREN = [[BODY_PART_NAMES[child] for child in children] for children in BODY_PART_CHILD_INDICES]
@@ -0,0 +1,169 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+LK_RADIUS = 7
+LK_LEVELS = 5
+LK_ITERATIONS = 10
+LK_MIN_EIGENVALUE = 1e-6
+LK_MAX_RESIDUAL = 0.1
+PYRAMID_MIN_SIZE = 16
+
+
+def to_gray(img):
+    ''' Returns the image as a grayscale float array with intensities from 0 to 1 '''
+
+    return np.asarray(img.convert('L'), dtype=np.float32) / 255.0
+
+
+def build_pyramid(image, levels=LK_LEVELS):
+    ''' Returns the image followed by up to levels - 1 versions of half the size of the previous, smoothed by a
+        binomial filter before subsampling such that features move consistently at every level '''
+
+    pyramid = [image]
+    for _ in range(levels - 1):
+        if min(pyramid[-1].shape) < 2 * PYRAMID_MIN_SIZE:
+            break
+
+        # Separable 5-tap binomial filter, repeating border pixels
+        padded = np.pad(pyramid[-1], 2, mode='edge')
+        rows = (padded[:, :-4] + padded[:, 4:] + 4 * (padded[:, 1:-3] + padded[:, 3:-1]) + 6 * padded[:, 2:-2])
+        smoothed = (rows[:-4] + rows[4:] + 4 * (rows[1:-3] + rows[3:-1]) + 6 * rows[2:-2]) * (1.0 / 256)
+        pyramid.append(smoothed[::2, ::2])
+
+    return pyramid
+
+
+def sample(image, x, y):
+    ''' Returns the image interpolated bilinearly at pixel coordinates, clamped to the border '''
+
+    height, width = image.shape
+    x = np.clip(x, 0, width - 1.001)
+    y = np.clip(y, 0, height - 1.001)
+    x0 = x.astype(np.int64)
+    y0 = y.astype(np.int64)
+    fx = x - x0
+    fy = y - y0
+
+    top = image[y0, x0] * (1 - fx) + image[y0, x0 + 1] * fx
+    bottom = image[y0 + 1, x0] * (1 - fx) + image[y0 + 1, x0 + 1] * fx
+    return top * (1 - fy) + bottom * fy
+
+
+def lucas_kanade(previous, current, points, radius=LK_RADIUS, levels=LK_LEVELS, iterations=LK_ITERATIONS):
+    ''' Returns points of shape (P, 2) in pixel coordinates of the previous image tracked into the current image by
+        pyramidal Lucas-Kanade, and whether each point was tracked reliably. All points are solved at once, sampling
+        only windows around the points instead of computing gradients of whole images '''
+
+    previous_pyramid = build_pyramid(previous, levels)
+    current_pyramid = build_pyramid(current, levels)
+
+    # Offsets of the pixels of a window from its center, shape (W,)
+    offsets = np.arange(-radius, radius + 1, dtype=np.float64)
+    offset_x, offset_y = [offset.ravel() for offset in np.meshgrid(offsets, offsets)]
+
+    points = np.asarray(points, dtype=np.float64)
+    flow = np.zeros_like(points)
+    for level in reversed(range(len(previous_pyramid))):
+        previous_level, current_level = previous_pyramid[level], current_pyramid[level]
+
+        # Windows of shape (P, W) around the points at this level, with gradients of the previous image
+        x = points[:, 0:1] / 2 ** level + offset_x
+        y = points[:, 1:2] / 2 ** level + offset_y
+        template = sample(previous_level, x, y)
+        gradient_x = (sample(previous_level, x + 1, y) - sample(previous_level, x - 1, y)) * 0.5
+        gradient_y = (sample(previous_level, x, y + 1) - sample(previous_level, x, y - 1)) * 0.5
+        gxx = (gradient_x * gradient_x).sum(axis=1)
+        gxy = (gradient_x * gradient_y).sum(axis=1)
+        gyy = (gradient_y * gradient_y).sum(axis=1)
+        determinant = gxx * gyy - gxy * gxy
+        solvable = determinant > 1e-12
+        determinant = np.where(solvable, determinant, 1.0)
+
+        # Refine the flow by Gauss-Newton steps solving the 2x2 normal equations of every point
+        for _ in range(iterations):
+            difference = template - sample(current_level, x + flow[:, 0:1], y + flow[:, 1:2])
+            bx = (difference * gradient_x).sum(axis=1)
+            by = (difference * gradient_y).sum(axis=1)
+            flow[:, 0] += np.where(solvable, (gyy * bx - gxy * by) / determinant, 0.0)
+            flow[:, 1] += np.where(solvable, (gxx * by - gxy * bx) / determinant, 0.0)
+
+        if level > 0:
+            flow *= 2
+
+    # Reject points without texture, points whose window differs too much after tracking and points leaving the image
+    window_size = len(offset_x)
+    min_eigenvalue = ((gxx + gyy) - np.sqrt((gxx - gyy) ** 2 + 4 * gxy * gxy)) / (2 * window_size)
+    residual = np.abs(template - sample(current, x + flow[:, 0:1], y + flow[:, 1:2])).mean(axis=1)
+    tracked = points + flow
+    height, width = current.shape
+    reliable = ((min_eigenvalue >= LK_MIN_EIGENVALUE) & (residual <= LK_MAX_RESIDUAL) &
+                (tracked[:, 0] >= 0) & (tracked[:, 0] <= width - 1) & (tracked[:, 1] >= 0) & (tracked[:, 1] <= height - 1))
+
+    return tracked, reliable
+
+
+def track_keypoints(previous_img, img, coordinates):
+    ''' Returns normalized coordinates of shape (NUM_BODY_PARTS, 2) of the previous frame tracked into the next frame,
+        keeping the previous coordinates of body parts that could not be tracked reliably '''
+
+    if img.size != previous_img.size:
+        img = img.resize(previous_img.size)
+
+    size = np.array(previous_img.size, dtype=np.float64)
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    points = coordinates * size
+
+    # Only the region around the keypoints is needed, as far as windows reach at the coarsest level
+    margin = (LK_RADIUS + 2) * 2 ** (LK_LEVELS - 1)
+    left, top = np.floor(points.min(axis=0) - margin).clip(0, None).astype(int)
+    right, bottom = np.ceil(np.minimum(points.max(axis=0) + margin, size)).astype(int)
+    box = (left, top, right, bottom)
+    tracked, reliable = lucas_kanade(to_gray(previous_img.crop(box)), to_gray(img.crop(box)), points - (left, top))
+
+    return np.where(reliable[:, None], (tracked + (left, top)) / size, coordinates)
+
+
+class FrameTracker:
+    ''' Keypoints of a frame tracked into the next frame of the same video by a background thread, reading both frames
+        from the image cache '''
+
+    def __init__(self, image_cache):
+        self.image_cache = image_cache
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.tracks = {}
+
+    def track(self, path, previous_path, coordinates):
+        ''' Track keypoints of the previous frame into the frame in the background, unless already tracked from the same
+            keypoints '''
+
+        coordinates = np.array(coordinates, dtype=np.float64)
+        track = self.tracks.get(path)
+        if track is None or not np.array_equal(track[1], coordinates):
+            self.tracks[path] = (self.executor.submit(self._track, previous_path, path, coordinates), coordinates)
+
+    def pending(self, path):
+        ''' Returns True if keypoints of the frame are being tracked '''
+
+        return path in self.tracks and not self.tracks[path][0].done()
+
+    def get(self, path):
+        ''' Returns tracked normalized coordinates of shape (NUM_BODY_PARTS, 2), or None unless tracked. Raises the
+            error of failed tracking, after which the frame is tracked again when its previous frame is confirmed '''
+
+        track = self.tracks.get(path)
+        if track is None or not track[0].done():
+            return None
+
+        future = self.tracks.pop(path)[0]
+        if future.cancelled():
+            return None
+        return future.result()
+
+    def close(self):
+        ''' Stop tracking '''
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _track(self, previous_path, path, coordinates):
+        return track_keypoints(self.image_cache.get(previous_path), self.image_cache.get(path), coordinates)